@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import datetime
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:  # valfritt beroende: pip install FetchFinancialsExcel[async]
+    aiohttp = None
+
+from . import company_data_extraction_EODH as eodh
+from .client import BASE_URL, EODHDClient
+from .fundamentals_filter import fundamentals_request, unflatten_filtered
+
+DEFAULT_CONCURRENCY = 100
+
+
+def run_coroutine(coro):
+    # asyncio.run går inte att anropa inifrån en loop som redan körs (t.ex. Jupyter)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class AsyncFetchEngine:
+    """
+    Asyncio based alternative to the thread pool in ``fetch_all_data``.
+
+    Fundamentals, EOD and real-time requests for all tickers are issued
+    concurrently on one event loop. ``concurrency`` bounds the number of
+    requests in flight and the number of tickers held in memory at once.
+    The CPU-bound indicator functions run in ``executor`` so they don't
+    stall the loop. ``fundamentals_mode``, ``run_state``, ``price_store``
+    and ``error_report`` mean the same as for ``fetch_fundamentals`` and
+    ``fetch_price_data``.
+    """
+
+    def __init__(self, client: EODHDClient, concurrency: int = DEFAULT_CONCURRENCY,
+                 executor: Optional[Executor] = None, price_store=None, fundamentals_mode: str = "full",
+                 run_state=None, error_report=None):
+        if aiohttp is None:
+            raise ImportError(
+                "The async engine requires aiohttp. Install it with: pip install FetchFinancialsExcel[async]"
+            )
+        self.client = client
+        self.concurrency = concurrency
+        self.executor = executor
+        self.price_store = price_store
+        self.fundamentals_mode = fundamentals_mode
+        self.run_state = run_state
+        self.error_report = error_report
+
+    async def _get_json(self, session, path: str, params: Optional[Dict[str, Any]] = None,
+                        decode: Optional[Callable[[bytes], Any]] = None) -> Any:
+        if self.client.retry is None:
+            return await self._request_json(session, path, params, decode)
+        return await self.client.retry.call_async(self._request_json, session, path, params, decode)
+
+    @staticmethod
+    async def _read_json(resp, decode: Optional[Callable[[bytes], Any]]) -> Any:
+        if decode is None:
+            return await resp.json(content_type=None)
+        return decode(await resp.read())
+
+    async def _request_json(self, session, path: str, params: Optional[Dict[str, Any]] = None,
+                            decode: Optional[Callable[[bytes], Any]] = None) -> Any:
+        query = dict(params or {})
+        query["api_token"] = self.client.api_key
+        query.setdefault("fmt", "json")
+
+        limiter = self.client.limiter
+        async with self._request_sem:
+            if limiter is None:
+                async with session.get(f"{BASE_URL}/{path}", params=query) as resp:
+                    resp.raise_for_status()
+                    return await self._read_json(resp, decode)
+
+            await limiter.before_async(path, params)
+            start = time.monotonic()
+            status = None
+            try:
+                async with session.get(f"{BASE_URL}/{path}", params=query) as resp:
+                    status = resp.status
+                    resp.raise_for_status()
+                    return await self._read_json(resp, decode)
+            finally:
+                limiter.after(status, time.monotonic() - start)
+
+    async def _get_cached_json(self, session, endpoint: str, ticker: str, params: Optional[Dict[str, Any]] = None,
+                               decode: Optional[Callable[[bytes], Any]] = None) -> Any:
+        cache = self.client.cache
+        loop = asyncio.get_running_loop()
+        # samma cachenycklar som EODHDClient.get_json
+        cache_params = params if decode is None else dict(params or {}, decode=decode.__name__)
+
+        # cachen läser/skriver filer, så det görs utanför event-loopen
+        if cache is not None:
+            cached = await loop.run_in_executor(None, cache.get, endpoint, ticker, cache_params)
+            if cached is not None:
+                return cached
+
+        if decode is None:
+            data = await self._get_json(session, f"{endpoint}/{ticker}", params)
+        else:
+            data = await self._get_json(session, f"{endpoint}/{ticker}", params, decode)
+
+        if cache is not None and data:
+            await loop.run_in_executor(None, cache.set, endpoint, ticker, cache_params, data)
+        return data
+
+    async def _fetch_fundamentals(self, session, ticker: str) -> Dict[str, Any]:
+        if self.run_state is not None:
+            stored = self.run_state.fundamentals(ticker)
+            if stored is not None:
+                return stored
+        mode = self.fundamentals_mode
+        params, decode = fundamentals_request(mode)
+        try:
+            data = await self._get_cached_json(session, "fundamentals", ticker, params, decode)
+            return unflatten_filtered(data) if mode == "filter" else data
+        except Exception as e:
+            print(f"Fel vid hämtning av data: {e}")
+            eodh.report_error(self.error_report, ticker, "fundamentals", e)
+            return {}
+
+    async def _fetch_price_data(self, session, ticker: str) -> Any:
+        if self.price_store is not None:
+            # kursbutiken är synkron, den körs i en tråd utanför loopen
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, eodh.fetch_price_data, ticker, self.client,
+                                              self.price_store, self.error_report)
+
+        today = datetime.datetime.today().date()
+        params = {"from": f"{int(eodh.CURRENT_YEAR)-5}-01-01", "to": today.isoformat(), "period": "d"}
+        try:
+            return await self._get_cached_json(session, "eod", ticker, params)
+        except Exception as e:
+            print(f"Error fetching data for {ticker}: {e}")
+            eodh.report_error(self.error_report, ticker, "prices", e)
+            return {ticker: {}}
+
+    async def _fetch_quote(self, session, ticker: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self._get_json(session, f"real-time/{ticker}")
+        except Exception as e:
+            print(f"Fel vid hämtning av realtidsdata: {e}")
+            eodh.report_error(self.error_report, ticker, "real_time", e)
+            return None
+
+    async def _fetch_quote_chunk(self, session, chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        path, params = eodh.real_time_chunk_request(chunk)
+        try:
+            return eodh.parse_real_time_quotes(await self._get_json(session, path, params))
+        except Exception as e:
+            print(f"Fel vid hämtning av realtidsdata för {len(chunk)} tickers: {e}")
+            return {}
+
+    async def _fetch_quotes(self, session, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        quotes = {}
+        chunks = eodh.real_time_chunks(tickers)
+        for chunk_quotes in await asyncio.gather(*(self._fetch_quote_chunk(session, c) for c in chunks)):
+            quotes.update(chunk_quotes)
+        return quotes
+
+    async def _quote_for(self, session, ticker: str, quotes: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # tickers som saknas i klumpsvaret hämtas en och en
+        quote = quotes.get(ticker.upper())
+        if quote is not None:
+            return quote
+        return await self._fetch_quote(session, ticker)
+
+    async def _process_ticker(self, session, ticker: str, compute, quotes: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        async with self._ticker_sem:
+            data, price_data, quote = await asyncio.gather(
+                self._fetch_fundamentals(session, ticker),
+                self._fetch_price_data(session, ticker),
+                self._quote_for(session, ticker, quotes),
+            )
+
+            price = {}
+            if quote is not None:
+                try:
+                    price = eodh.real_time_fields(quote, data)
+                    print(f"Price data fetched for {ticker}.")
+                except Exception as e:
+                    print(f"Error fetching price data: {e}")
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, compute, ticker, data, price_data, price)
+
+    async def fetch(self, tickers: List[str], compute) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        self._request_sem = asyncio.BoundedSemaphore(self.concurrency)
+        self._ticker_sem = asyncio.BoundedSemaphore(self.concurrency)
+        if self.client.limiter is not None:
+            # AIMD-gränsen får växa upp till motorns concurrency
+            self.client.limiter.concurrency.ensure_maximum(self.concurrency)
+
+        connect_timeout, read_timeout = self.client.timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+
+        own_executor = self.executor is None
+        self._executor = self.executor or ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                unique = list(dict.fromkeys(t for t in tickers if t))
+                quotes = await self._fetch_quotes(session, unique)
+                results = await asyncio.gather(*(self._process_ticker(session, t, compute, quotes) for t in unique))
+        finally:
+            if own_executor:
+                self._executor.shutdown(wait=False)
+
+        return dict(zip(unique, results))
+
+    def run(self, tickers: List[str], compute) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return run_coroutine(self.fetch(tickers, compute))
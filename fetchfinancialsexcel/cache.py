@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+
+# TTL per endpoint i sekunder. Fundamenta ändras som mest kvartalsvis,
+# dagliga kurser en gång per handelsdag.
+DEFAULT_TTLS = {
+    "fundamentals": 7 * 24 * 3600,
+    "eod": 12 * 3600,
+}
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for raw EODHD JSON responses.
+
+    Entries are keyed by endpoint + ticker + request params and stored as one
+    JSON file each. Every endpoint has its own TTL (endpoints without a TTL are
+    never cached) and the directory is kept below ``max_bytes`` by evicting the
+    least recently used entries.
+    """
+
+    def __init__(self, cache_dir: str, ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = Lock()
+        # key -> storlek i bytes, ordnad från äldst till senast använd
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-5], st.st_size))
+
+        # mtime uppdateras vid varje träff, så äldst först = LRU-ordning
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def make_key(endpoint: str, ticker: str, params: Optional[Dict[str, Any]] = None) -> str:
+        params = params or {}
+        raw = json.dumps([endpoint, ticker, sorted(params.items())], default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, endpoint: str, ticker: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        ttl = self.ttls.get(endpoint)
+        if not ttl:
+            return None
+
+        key = self.make_key(endpoint, ticker, params)
+        path = self._path(key)
+
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get("stored_at", 0) > ttl:
+            with self._lock:
+                self._remove(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return entry.get("data")
+
+    def set(self, endpoint: str, ticker: str, params: Optional[Dict[str, Any]], data: Any) -> None:
+        if not self.ttls.get(endpoint):
+            return
+
+        key = self.make_key(endpoint, ticker, params)
+        path = self._path(key)
+        entry = {"endpoint": endpoint, "ticker": ticker, "stored_at": time.time(), "data": data}
+
+        # skriv till temporär fil först så att en avbruten körning inte lämnar trasiga poster
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Kunde inte spara cachepost för {ticker}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _remove(self, key: str) -> None:
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._index and (
+            self._total_bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._index) > self.max_entries)
+        ):
+            oldest = next(iter(self._index))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,84 @@
+import os
+import json
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def _json_default(value):
+    # numpy-typer från indikatorerna
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON lines journal of finished tickers for ``process_excel_file``.
+
+    Every ticker's ``(combined, other)`` result is written as soon as it is
+    computed, one ``{"ticker", "combined", "other"}`` object per line, so a
+    crashed run can be resumed and only the remaining tickers are fetched.
+    With ``resume=False`` an existing journal at ``path`` is deleted.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self._lock = Lock()
+        self._results: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            print(f"Discarding existing checkpoint journal {path} (use --resume to continue it)")
+            os.remove(path)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._results[entry["ticker"]] = (entry["combined"], entry["other"])
+                except (ValueError, KeyError, TypeError):
+                    # sista raden kan vara halvskriven om körningen kraschade
+                    continue
+        print(f"Resuming: {len(self._results)} tickers already completed in {self.path}")
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, ticker: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return self._results.get(ticker.upper())
+
+    def record(self, ticker: str, combined: Dict[str, Any], other: Dict[str, Any]) -> None:
+        line = json.dumps({"ticker": ticker.upper(), "combined": combined, "other": other}, default=_json_default)
+        with self._lock:
+            self._results[ticker.upper()] = (combined, other)
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -4,6 +4,8 @@ import os
 from pathlib import Path
 
 from .core import FundamentalDataFetcher
+from . import reader
+from .reader import input_format, ALL_SHEETS
 
 def validate_api_key(api_key: str) -> bool:
     if not api_key or len(api_key) < 10:
@@ -16,12 +18,23 @@ def validate_excel_file(file_path: str) -> bool:
         print(f"Error: File '{file_path}' does not exist.")
         return False
     
-    if not file_path.lower().endswith(('.xlsx', '.xls')):
-        print(f"Error: File '{file_path}' is not an Excel file (.xlsx or .xls).")
+    if input_format(file_path) is None:
+        print(f"Error: File '{file_path}' is not an Excel, CSV or Parquet file (.xlsx, .xlsm, .xls, .csv or .parquet).")
+        return False
+    
+    if input_format(file_path) == "parquet" and reader.pyarrow is None:
+        print("Error: Reading Parquet requires pyarrow. Install it with: pip install FetchFinancialsExcel[parquet]")
         return False
     
     return True
 
+def parse_sheets(value):
+    if not value:
+        return None
+    if value.strip().lower() == ALL_SHEETS:
+        return ALL_SHEETS
+    return [name.strip() for name in value.split(',') if name.strip()]
+
 def main():
     """Main entry point for the CLI."""
     parser = argparse.ArgumentParser(
@@ -37,13 +50,26 @@ def main():
     parser.add_argument(
         '--input', '-i',
         required=True,
-        help='Path to input Excel file containing tickers'
+        help='Path to input file with company names, tickers and ISINs (.xlsx, .xlsm, .xls, .csv or .parquet)'
+    )
+    
+    parser.add_argument(
+        '--sheets',
+        default=None,
+        help='Comma-separated sheet names to read from an Excel input, or "all" (default: first sheet)'
     )
     
     parser.add_argument(
         '--output', '-o',
         required=True,
-        help='Path to output Excel file for results'
+        help='Path to output file for results (.xlsx, .parquet, .arrow/.feather or .csv)'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=['xlsx', 'parquet', 'arrow', 'csv'],
+        default=None,
+        help='Output format (default: from the output file extension, xlsx if unknown). Parquet and Arrow require pyarrow'
     )
     
     parser.add_argument(
@@ -53,6 +79,150 @@ def main():
         help='Number of concurrent workers for data fetching (default: 10)'
     )
     
+    parser.add_argument(
+        '--engine',
+        choices=['threads', 'async', 'pipeline'],
+        default='threads',
+        help='Fetch engine: thread pool, asyncio (requires aiohttp) or a streaming pipeline that computes indicators while other tickers download (default: threads)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=100,
+        help='Maximum concurrent requests for the async engine (default: 100)'
+    )
+    
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=0,
+        help='Compute indicators in this many worker processes instead of the download threads (default: 0, off)'
+    )
+    
+    parser.add_argument(
+        '--fundamentals',
+        choices=['full', 'slim', 'filter'],
+        default='slim',
+        help='Fundamentals download: whole response, decode only the sections the indicators use, or ask EODHD to send only those sections (default: slim)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Directory for caching raw API responses between runs (default: no cache)'
+    )
+    
+    parser.add_argument(
+        '--price-store',
+        default=None,
+        help='Directory for local price history; only new days are downloaded on later runs'
+    )
+    
+    parser.add_argument(
+        '--seed-prices',
+        action='store_true',
+        help='Extend stored price histories from the bulk last-day endpoint, one request per exchange (requires --price-store)'
+    )
+    
+    parser.add_argument(
+        '--factor-dir',
+        default=None,
+        help='Directory for storing Fama-French factors locally, refreshed monthly'
+    )
+    
+    parser.add_argument(
+        '--factors-file',
+        default=None,
+        help='Offline mode: read Fama-French factors from this CSV/ZIP file (or directory) instead of downloading'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=30.0,
+        help='Read timeout in seconds for each API request (default: 30)'
+    )
+    
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=0,
+        help='EODHD API calls per minute shared by all requests, fundamentals count as 10 (default: 0, off)'
+    )
+    
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=3,
+        help='Attempts per request for timeouts, 429 and 5xx errors; 401/403/404 are not retried (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--retry-deadline',
+        type=float,
+        default=60.0,
+        help='Give up retrying a request after this many seconds (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--error-report',
+        default=None,
+        help='CSV file with per-ticker failures (default: <output>.errors.csv, only written if something failed)'
+    )
+    
+    parser.add_argument(
+        '--state-dir',
+        default=None,
+        help='Directory with per-ticker inputs and results of earlier runs; only tickers whose fundamentals or prices changed are refetched (delta refresh)'
+    )
+    
+    parser.add_argument(
+        '--state-max-age',
+        type=float,
+        default=7,
+        help='Days before a stored ticker is refetched in full even if unchanged (default: 7)'
+    )
+    
+    parser.add_argument(
+        '--ticker-index',
+        default=None,
+        help='File with ISIN/name/ticker search results kept between runs; known rows are resolved without search requests'
+    )
+    
+    parser.add_argument(
+        '--seed-index',
+        default=None,
+        help='Comma-separated exchanges (e.g. US,ST) whose symbol lists seed the ticker index, one request per exchange; earlier exchanges win (requires --ticker-index)'
+    )
+    
+    parser.add_argument(
+        '--index-ttl',
+        type=float,
+        default=30,
+        help='Days before a ticker index entry is looked up again; searches without a match are retried after a day (default: 30)'
+    )
+    
+    parser.add_argument(
+        '--match-confidence',
+        type=float,
+        default=0.85,
+        help='Company names are matched offline against the names in the ticker index; matches below this confidence (0-1) use the search API (default: 0.85)'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        default=None,
+        help='Journal file for finished tickers (default: <output>.checkpoint.jsonl), removed after a successful run; '
+             'an existing journal is deleted unless --resume is given'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume an interrupted run, skipping tickers already in the checkpoint journal'
+    )
+    
     parser.add_argument(
         '--version',
         action='version',
@@ -75,20 +245,96 @@ def main():
         print("Error: Number of workers must be between 1 and 50.")
         sys.exit(1)
     
+    if args.processes < 0:
+        print("Error: Number of processes cannot be negative.")
+        sys.exit(1)
+    
+    if args.concurrency < 1:
+        print("Error: Concurrency must be at least 1.")
+        sys.exit(1)
+    
+    if args.seed_prices and not args.price_store:
+        print("Error: --seed-prices requires --price-store.")
+        sys.exit(1)
+    
+    if args.factors_file and not os.path.exists(args.factors_file):
+        print(f"Error: Factors file '{args.factors_file}' does not exist.")
+        sys.exit(1)
+    
+    if args.rate_limit < 0:
+        print("Error: Rate limit cannot be negative.")
+        sys.exit(1)
+    
+    if args.retries < 1:
+        print("Error: Retries must be at least 1.")
+        sys.exit(1)
+    
+    if args.retry_deadline <= 0:
+        print("Error: Retry deadline must be a positive number of seconds.")
+        sys.exit(1)
+    
+    if args.seed_index and not args.ticker_index:
+        print("Error: --seed-index requires --ticker-index.")
+        sys.exit(1)
+    
+    if args.index_ttl <= 0:
+        print("Error: Index TTL must be a positive number of days.")
+        sys.exit(1)
+    
+    if not 0 < args.match_confidence <= 1:
+        print("Error: Match confidence must be between 0 and 1.")
+        sys.exit(1)
+    
+    if args.state_max_age <= 0:
+        print("Error: State max age must be a positive number of days.")
+        sys.exit(1)
+    
+    if args.timeout <= 0:
+        print("Error: Timeout must be a positive number of seconds.")
+        sys.exit(1)
+    
     # Create output directory if it doesn't exist
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint_file = args.checkpoint or f"{args.output}.checkpoint.jsonl"
     
     try:
         # Initialize the fetcher
         print("Initializing Fundamental Data Fetcher...")
-        fetcher = FundamentalDataFetcher(api_key=args.api_key)
+        fetcher = FundamentalDataFetcher(
+            api_key=args.api_key,
+            cache_dir=args.cache_dir,
+            pool_size=args.workers,
+            read_timeout=args.timeout,
+            price_store_dir=args.price_store,
+            factor_store_dir=args.factor_dir,
+            factors_file=args.factors_file,
+            rate_limit=args.rate_limit,
+            retry_attempts=args.retries,
+            retry_deadline=args.retry_deadline,
+            compute_processes=args.processes,
+            fundamentals_mode=args.fundamentals,
+            state_dir=args.state_dir,
+            state_max_age=args.state_max_age,
+            ticker_index=args.ticker_index,
+            ticker_index_ttl=args.index_ttl,
+            match_confidence=args.match_confidence
+        )
         
         # Process the file
         fetcher.process_excel_file(
             input_file=args.input,
             output_file=args.output,
-            max_workers=args.workers
+            max_workers=args.workers,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            seed_prices=args.seed_prices,
+            checkpoint_file=checkpoint_file,
+            resume=args.resume,
+            error_report_file=args.error_report or f"{args.output}.errors.csv",
+            output_format=args.format,
+            seed_index=args.seed_index.split(',') if args.seed_index else None,
+            input_sheets=parse_sheets(args.sheets)
         )
         
         print(f"\n Success! Results saved to: {args.output}")
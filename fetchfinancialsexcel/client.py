@@ -0,0 +1,101 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+BASE_URL = "https://eodhd.com/api"
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+
+class EODHDClient:
+    """
+    Shared HTTP client for all EODHD calls.
+
+    Wraps one ``requests.Session`` so that connections are pooled and kept
+    alive between requests instead of doing a new TCP+TLS handshake per call.
+    Every request gets a (connect, read) timeout and, when a ``ResponseCache``
+    is attached, cacheable endpoints are served from disk. With a
+    ``RateLimiter`` every request waits for its share of the EODHD limit,
+    and with a ``RetryPolicy`` transient failures are retried.
+    """
+
+    def __init__(self, api_key: str, pool_size: int = 10,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 cache=None, limiter=None, retry=None):
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.pool_size = 0
+        self._pool_lock = Lock()
+        self.session = requests.Session()
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size: int) -> None:
+        # poolen ska rymma en anslutning per worker, annars kastas anslutningar bort
+        with self._pool_lock:
+            if pool_size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.pool_size = pool_size
+        if self.limiter is not None:
+            self.limiter.concurrency.ensure_maximum(pool_size)
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        if self.retry is None:
+            return self._get_once(path, params)
+        return self.retry.call(self._get_once, path, params)
+
+    def _get_once(self, path: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        query = dict(params or {})
+        query["api_token"] = self.api_key
+        query.setdefault("fmt", "json")
+
+        if self.limiter is None:
+            resp = self.session.get(f"{BASE_URL}/{path}", params=query, timeout=self.timeout)
+            resp.raise_for_status()
+            return resp
+
+        self.limiter.before(path, params)
+        start = time.monotonic()
+        status = None
+        try:
+            resp = self.session.get(f"{BASE_URL}/{path}", params=query, timeout=self.timeout)
+            status = resp.status_code
+        finally:
+            self.limiter.after(status, time.monotonic() - start)
+        resp.raise_for_status()
+        return resp
+
+    def get_json(self, endpoint: str, ticker: str, params: Optional[Dict[str, Any]] = None,
+                 decode: Optional[Callable[[bytes], Any]] = None) -> Any:
+        """
+        Decoded JSON for ``endpoint/ticker``. ``decode`` replaces the default
+        decoder on the raw body, e.g. to keep only part of the response;
+        such entries are cached apart from the full ones.
+        """
+        cache_params = params
+        if decode is not None:
+            cache_params = dict(params or {}, decode=decode.__name__)
+
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, ticker, cache_params)
+            if cached is not None:
+                return cached
+
+        resp = self.get(f"{endpoint}/{ticker}", params)
+        data = resp.json() if decode is None else decode(resp.content)
+
+        if self.cache is not None and data:
+            self.cache.set(endpoint, ticker, cache_params, data)
+        return data
+
+    def close(self) -> None:
+        self.session.close()
@@ -1,64 +1,149 @@
 import requests
 import datetime 
-from collections import defaultdict
 import concurrent.futures
 import statistics
 
+from .client import EODHDClient
+from .price_series import as_price_series
+from .fundamentals_view import as_fundamentals_view
+from .fundamentals_filter import fundamentals_request, unflatten_filtered
+
 # =============== Globals ===============
 API_KEY = None  # set by the FundamentalDataFetcher class
 now = datetime.datetime.today()
 CURRENT_YEAR = now.strftime("%Y")
 # ========================================
 
+# klient för API_KEY om modulen används utan FundamentalDataFetcher, som skickar in sin egen
+def get_client():
+	return EODHDClient(API_KEY)
+
+# sparar felet per ticker i felrapporten om en sådan finns
+def report_error(error_report, ticker, stage, exc):
+	if error_report is not None:
+		error_report.record(ticker, stage, exc)
+
 # huvudfunktion 
-def fetch_fundamentals(ticker):
+def fetch_fundamentals(ticker, client=None, mode="full", run_state=None, error_report=None):
+	# oförändrade fundamenta från föregående körning vid delta-uppdatering
+	if run_state is not None:
+		stored = run_state.fundamentals(ticker)
+		if stored is not None:
+			return stored
+	client = client or get_client()
+	# "slim" avkodar bara sektionerna indikatorerna använder, "filter" låter EODHD skicka bara dem
+	params, decode = fundamentals_request(mode)
 	try:
-		url = f"https://eodhd.com/api/fundamentals/{ticker}?api_token={API_KEY}&fmt=json"
-		resp = requests.get(url)
-		resp.raise_for_status()
-		return resp.json()
+		data = client.get_json("fundamentals", ticker, params, decode=decode)
+		return unflatten_filtered(data) if mode == "filter" else data
 	except Exception as e:
 		print(f"Fel vid hämtning av data: {e}")
+		report_error(error_report, ticker, "fundamentals", e)
 		return {}
 
+# General::UpdatedAt utan resten av fundamentasvaret, None om det inte gick
+def fetch_fundamentals_updated_at(ticker, client=None):
+	client = client or get_client()
+	try:
+		resp = client.get(f"fundamentals/{ticker}", {"filter": "General::UpdatedAt"}).json()
+	except Exception as e:
+		print(f"Fel vid hämtning av UpdatedAt för {ticker}: {e}")
+		return None
+	if isinstance(resp, dict):
+		resp = resp.get("General::UpdatedAt") or (resp.get("General") or {}).get("UpdatedAt")
+	return str(resp) if isinstance(resp, (str, int)) and resp else None
+
 # hämta prisdata, separat API call
-def fetch_price_data(ticker):
+def fetch_price_data(ticker, client=None, price_store=None, error_report=None):
+    client = client or get_client()
     today = datetime.datetime.today().date()
     from_date = f"{int(CURRENT_YEAR)-5}-01-01"  
     to_date = today.isoformat()      
 
-    url = f"https://eodhd.com/api/eod/{ticker}?from={from_date}&to={to_date}&period=d&api_token={API_KEY}&fmt=json"
-
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        # med lokal kurshistorik hämtas bara dagarna sedan senaste körningen
+        if price_store is not None:
+            try:
+                return price_store.get_history(ticker, client, from_date, to_date)
+            except requests.exceptions.RequestException:
+                raise
+            except (OSError, ValueError) as e:
+                # oläsbar eller trasig lokal historik, hela perioden hämtas som utan kursbutik
+                print(f"Error reading stored prices for {ticker}, fetching full history: {e}")
+                report_error(error_report, ticker, "prices", e)
+        data = client.get_json("eod", ticker, {"from": from_date, "to": to_date, "period": "d"})
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data for {ticker}: {e}")
+        report_error(error_report, ticker, "prices", e)
         return {ticker: {}}
-    
+
     return data
 
 # returnerar {'price': 212.43}
-def real_time_price(ticker, data):
+def real_time_price(ticker, data, client=None, quotes=None, error_report=None):
+    # använd förhämtad kurs från fetch_real_time_quotes om den finns
+    if quotes is not None and ticker.upper() in quotes:
+        return real_time_fields(quotes[ticker.upper()], data)
+
+    client = client or get_client()
     try:
-        url = f"https://eodhd.com/api/real-time/{ticker}?api_token={API_KEY}&fmt=json"
-        
-        general = data.get("General", {})
-        
-        resp = requests.get(url)
-        resp.raise_for_status()
-        resp = resp.json()
-        return {
-            "Price": resp.get("open"),
-            "Currency": general.get("CurrencyCode"),
-			"Sector": general.get("Sector")
-        }
+        resp = client.get(f"real-time/{ticker}").json()
+        return real_time_fields(resp, data)
 	
     except Exception as e:
         print(f"Fel vid hämtning av realtidsdata: {e}")
+        report_error(error_report, ticker, "real_time", e)
         return {}
 
+# realtidskurser för många tickers, REAL_TIME_CHUNK_SIZE symboler per anrop via s=
+REAL_TIME_CHUNK_SIZE = 20
+
+def real_time_chunks(tickers, chunk_size=REAL_TIME_CHUNK_SIZE):
+    unique = list(dict.fromkeys(t.upper() for t in tickers if t))
+    return [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+
+# första symbolen i sökvägen, resten kommaseparerade i s=
+def real_time_chunk_request(chunk):
+    params = {"s": ",".join(chunk[1:])} if len(chunk) > 1 else {}
+    return f"real-time/{chunk[0]}", params
+
+# svaret är ett objekt för en symbol och en lista för flera, nycklat på "code"
+def parse_real_time_quotes(resp):
+    if isinstance(resp, dict):
+        resp = [resp]
+    quotes = {}
+    for quote in resp or []:
+        if isinstance(quote, dict) and quote.get("code"):
+            quotes[str(quote["code"]).upper()] = quote
+    return quotes
+
+# returnerar {'AAPL.US': {...realtidssvar...}, ...}
+def fetch_real_time_quotes(tickers, client=None, chunk_size=REAL_TIME_CHUNK_SIZE, max_workers=4):
+    client = client or get_client()
+
+    def fetch_chunk(chunk):
+        path, params = real_time_chunk_request(chunk)
+        try:
+            return parse_real_time_quotes(client.get(path, params).json())
+        except Exception as e:
+            print(f"Fel vid hämtning av realtidsdata för {len(chunk)} tickers: {e}")
+            return {}
+
+    quotes = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_quotes in executor.map(fetch_chunk, real_time_chunks(tickers, chunk_size)):
+            quotes.update(chunk_quotes)
+    return quotes
+
+# plockar ut pris ur ett realtidssvar, valuta och sektor från fundamenta
+def real_time_fields(quote, data):
+    general = data.get("General", {})
+    return {
+        "Price": quote.get("open"),
+        "Currency": general.get("CurrencyCode"),
+        "Sector": general.get("Sector")
+    }
+
 # ROE, Avkastning, Rörelsemarginal, Utdelning
 def get_selected_highlights(data):
 	highlights = data.get("Highlights", {})
@@ -77,19 +162,21 @@ def get_selected_highlights(data):
 
 # ROCE 
 def calculate_roce(data):
-	income_statement = data.get("Financials", {}).get("Income_Statement", {}).get("yearly", {})
-	balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+	view = as_fundamentals_view(data)
+	income_statement = view.statement("Income_Statement")
+	balance_sheet = view.statement("Balance_Sheet")
 
 	if not income_statement or not balance_sheet:
 		return {"ROCE": None}
 
 	# Hämta senaste året
-	latest_year = sorted(income_statement.keys(), reverse=True)[0]
+	latest_year = income_statement.dates[0]
+	bs_offset = balance_sheet.offset(latest_year)
 
 	try:
-		ebit = float(income_statement[latest_year].get("ebit", 0))
-		total_assets = float(balance_sheet[latest_year].get("totalAssets", 0))
-		current_liabilities = float(balance_sheet[latest_year].get("totalCurrentLiabilities", 0))
+		ebit = income_statement.number(0, "ebit", 0)
+		total_assets = balance_sheet.number(bs_offset, "totalAssets", 0)
+		current_liabilities = balance_sheet.number(bs_offset, "totalCurrentLiabilities", 0)
 	except (ValueError, TypeError):
 		return {"ROCE": None}
 
@@ -228,9 +315,10 @@ def get_moving_averages(data):
 
 # Returnerar {'FCF Yield Growth (YoY)': 0.051, 'Average FCF Yield (5y)': 0.0388}
 def fcf_yield_growth_latest(data):
-    cf_data = data.get("Financials", {}).get("Cash_Flow", {}).get("yearly", {})
-    highlights = data.get("Highlights", {})
-    balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+    view = as_fundamentals_view(data)
+    cf_data = view.statement("Cash_Flow")
+    highlights = view.get("Highlights", {})
+    balance_sheet = view.statement("Balance_Sheet")
 
     if not cf_data or not highlights or not balance_sheet:
         return {}
@@ -239,10 +327,7 @@ def fcf_yield_growth_latest(data):
     if not market_cap:
         return {}
 
-    latest_date = max(balance_sheet.keys())
-    latest_bs = balance_sheet[latest_date]
-
-    net_debt = latest_bs.get("netDebt")
+    net_debt = balance_sheet.get(0, "netDebt")
 
     try:
         market_cap = float(market_cap)
@@ -257,9 +342,10 @@ def fcf_yield_growth_latest(data):
         return {}
 
     fcf_yields = []
-    for year, values in cf_data.items():
+    # i svarets ordning, som tidigare, innan den stabila sorteringen nedan
+    for year in cf_data.yearly:
         try:
-            fcf = float(values.get("freeCashFlow", 0))
+            fcf = cf_data.number(cf_data.offset(year), "freeCashFlow", 0)
             yield_val = fcf / ev
             fcf_yields.append((year, yield_val))
         except (TypeError, ValueError):
@@ -313,31 +399,18 @@ def calculate_eps_per_year(data):
 def get_average_annual_close_prices(data, ticker):
     start_year = int(CURRENT_YEAR) - 5
     end_year = int(CURRENT_YEAR) - 1
-    cutoff_date = f"{end_year}-12-31"
 
-    # Group adjusted close prices by year
-    yearly_prices = defaultdict(list)
-    
-    for entry in data:
-        date = entry['date']
-        if date > cutoff_date:
-            continue  # Skip dates beyond the cutoff
-
-        year = date[:4]
-        adjusted_close = entry.get('adjusted_close')
-        if adjusted_close is not None:
-            yearly_prices[year].append(float(adjusted_close))
+    # Average adjusted close per calendar year, shared with the other price indicators
+    yearly_prices = as_price_series(data).annual_average_closes()
     
     results = {}
     for year in range(start_year, end_year + 1):
         year_str = str(year)
-        prices = yearly_prices.get(year_str, [])
-        
-        if prices:
-            average_close = sum(prices) / len(prices)
+        if year in yearly_prices:
+            average_close, data_points = yearly_prices[year]
             results[year_str] = {
                 "average_close": round(average_close, 4),
-                "data_points": len(prices)
+                "data_points": data_points
             }
         else:
             print(f"No price data for year {year} for {ticker}.")
@@ -400,24 +473,22 @@ def get_percent_insiders(data):
 
 # {'change_in_stocks': -0.0063}
 def buyback_change_latest(data):
-	inc_data = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+	inc_data = as_fundamentals_view(data).statement("Balance_Sheet")
 
-	shares_dict = {}
-	for date, values in inc_data.items():
+	# datumen är redan sorterade i fallande ordning (senaste först)
+	shares = []
+	for offset in range(len(inc_data)):
 		try:
-			shares = float(values.get("commonStockSharesOutstanding", 0))
-			shares_dict[date] = shares
+			shares.append(inc_data.number(offset, "commonStockSharesOutstanding", 0))
 		except (TypeError, ValueError):
 			continue
+		if len(shares) == 2:
+			break
 
-	if len(shares_dict) < 2:
+	if len(shares) < 2:
 		return {}
 
-	# Sortera datumen i fallande ordning (senaste först)
-	sorted_quarters = sorted(shares_dict.items(), reverse=True)
-
-	_, latest_shares = sorted_quarters[0]
-	_, prev_shares = sorted_quarters[1]
+	latest_shares, prev_shares = shares
 
 	diff = latest_shares - prev_shares
 	percent_change = (diff / prev_shares) if prev_shares != 0 else None
@@ -429,24 +500,23 @@ def buyback_change_latest(data):
 def buyback_extensive(data):
     try:
         # Hämta årsdata ur balansräkningen
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-        sorted_dates = sorted(balance_sheet.keys(), reverse=True)
+        balance_sheet = as_fundamentals_view(data).statement("Balance_Sheet")
 
-        if len(sorted_dates) < 2:
+        if len(balance_sheet) < 2:
             return {}
 
         # Hjälpfunktion för att hämta och konvertera aktieantal
-        def get_shares(date_key):
+        def get_shares(offset):
             try:
-                return float(balance_sheet[date_key].get("commonStockSharesOutstanding", 0))
+                return balance_sheet.number(offset, "commonStockSharesOutstanding", 0)
             except (TypeError, ValueError):
                 return 0.0
 
         # Hämta värden
-        this_year_shares = get_shares(sorted_dates[0])
-        one_year_ago_shares = get_shares(sorted_dates[1])
-        three_years_ago_shares = get_shares(sorted_dates[3]) if len(sorted_dates) > 3 else None
-        five_years_ago_shares = get_shares(sorted_dates[5]) if len(sorted_dates) > 5 else None
+        this_year_shares = get_shares(0)
+        one_year_ago_shares = get_shares(1)
+        three_years_ago_shares = get_shares(3) if len(balance_sheet) > 3 else None
+        five_years_ago_shares = get_shares(5) if len(balance_sheet) > 5 else None
 
         results = {}
 
@@ -472,20 +542,18 @@ def buyback_extensive(data):
 def total_yield(data): 
 	try: 
 		### Debt Paydown Yield 
-		highlights = data.get("Highlights", {})
+		view = as_fundamentals_view(data)
+		highlights = view.get("Highlights", {})
 		market_cap = highlights.get("MarketCapitalization")
 
-		balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-		sorted_dates = sorted(balance_sheet.keys(), reverse=True)
+		balance_sheet = view.statement("Balance_Sheet")
 
-		latest_year = sorted_dates[0]
-		second_latest_year = sorted_dates[1]
+		# nettoskuldens förändring kräver två år
+		if len(balance_sheet.rows) < 2:
+			return {}
 
-		latest_bs = balance_sheet[latest_year]
-		previous_bs = balance_sheet[second_latest_year]
-
-		latest_net_debt = float(latest_bs.get("netDebt"))
-		previous_net_debt = float(previous_bs.get("netDebt"))
+		latest_net_debt = balance_sheet.number(0, "netDebt")
+		previous_net_debt = balance_sheet.number(1, "netDebt")
 
 		# Make sure we have all necessary values
 		if market_cap and latest_net_debt is not None and previous_net_debt is not None:
@@ -495,7 +563,7 @@ def total_yield(data):
 			print("Missing data to compute Debt Paydown Yield.")
 
 		### Buyback Yield 
-		buyback_rate = buyback_change_latest(data).get("Förändring Antal Aktier")
+		buyback_rate = buyback_change_latest(view).get("Förändring Antal Aktier")
 		# positiva värden blir negativa, negativa blir positiva 
 		buyback_yield_korrigerad = (-1 * buyback_rate) 
 		
@@ -514,12 +582,12 @@ def total_yield(data):
 # bruttovinstmarginal, vinst i förhållande till intäkt 
 def gross_profitability(data):
     try:
-        highlights = data.get("Highlights", {})
-        gross_profit_ttm = float(highlights.get("GrossProfitTTM", {}))
+        view = as_fundamentals_view(data)
+        highlights = view.get("Highlights", {})
+        gross_profit_ttm = float(highlights.get("GrossProfitTTM"))
 
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-        latest_year = sorted(balance_sheet.keys(), reverse=True)[0]
-        total_assets = float(balance_sheet.get(latest_year, {}).get("totalAssets", {}))
+        balance_sheet = view.statement("Balance_Sheet")
+        total_assets = balance_sheet.number(0, "totalAssets")
 
         # gross profitability = gross profit / total assets 
         g_profitability = gross_profit_ttm / total_assets
@@ -533,15 +601,14 @@ def gross_profitability(data):
 def accruals(data):
     try:
         # netIncome & CashFlowFromOperations
-        chash_flow = data.get("Financials", {}).get("Cash_Flow", {}).get("yearly", {})
-        latest_year = sorted(chash_flow.keys(), reverse=True)[0]
-        net_income = float(chash_flow.get(latest_year, {}).get("netIncome", {}))
-        cash_flow_operating = float(chash_flow.get(latest_year, {}).get("totalCashFromOperatingActivities", {}))
+        view = as_fundamentals_view(data)
+        chash_flow = view.statement("Cash_Flow")
+        net_income = chash_flow.number(0, "netIncome")
+        cash_flow_operating = chash_flow.number(0, "totalCashFromOperatingActivities")
         
         # totalAssets
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-        latest_year = sorted(balance_sheet.keys(), reverse=True)[0]
-        total_Assets = float(balance_sheet.get(latest_year, {}).get("totalAssets", {}))
+        balance_sheet = view.statement("Balance_Sheet")
+        total_Assets = balance_sheet.number(0, "totalAssets")
 
         # accruals = netIncome - cashFlowOperating  / totalAssets
         accruals = (net_income - cash_flow_operating) / total_Assets
@@ -553,10 +620,9 @@ def accruals(data):
 # tillgångstillväxt: tillväxt i totalAssets 
 def asset_growth(data):
     try: 
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-        last_two_y = sorted(balance_sheet.keys(), reverse=True)[0:2]
-        total_Assets_now = float(balance_sheet.get(last_two_y[0], {}).get("totalAssets", {}))
-        total_Assets_then = float(balance_sheet.get(last_two_y[1], {}).get("totalAssets", {}))
+        balance_sheet = as_fundamentals_view(data).statement("Balance_Sheet")
+        total_Assets_now = balance_sheet.number(0, "totalAssets")
+        total_Assets_then = balance_sheet.number(1, "totalAssets")
 
         # assetGrowth = TotalAssetsNow - totalAssetsThen / totalAssetsThen
         asset_g = (total_Assets_now - total_Assets_then) / total_Assets_then
@@ -570,42 +636,43 @@ def compute_cop_at(data):
 
     try:
         # cash based operating profits
-        income_statement = data.get("Financials", {}).get("Income_Statement", {}).get("yearly", {})
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+        view = as_fundamentals_view(data)
+        income_statement = view.statement("Income_Statement")
+        balance_sheet = view.statement("Balance_Sheet")
 
         # Ensure we have at least two years of data
         if len(income_statement) < 2 or len(balance_sheet) < 2:
             return {"cop_at": None}
 
-        # Hämta senaste året
-        sorted_years_income = sorted(income_statement.keys(), reverse=True)
-        sorted_years_balance = sorted(balance_sheet.keys(), reverse=True)
-
-        latest_year = sorted_years_income[0]
-        second_latest_year = sorted_years_income[1]
+        # Hämta senaste året, balansräkningen slås upp på resultaträkningens datum
+        latest_year = income_statement.dates[0]
+        second_latest_year = income_statement.dates[1]
 
         # ebit
-        ebit = float(income_statement[latest_year].get("ebit", 0))
+        ebit = income_statement.number(0, "ebit", 0)
 
         # set ebit to operating income if ebit is None
         if ebit is None: 
-            ebit = float(income_statement[latest_year].get("operatingIncome", 0))
+            ebit = income_statement.number(0, "operatingIncome", 0)
 
         # deprication and amortization
-        deprication_and_amortization = float(income_statement[latest_year].get("depreciationAndAmortization", 0))
+        deprication_and_amortization = income_statement.number(0, "depreciationAndAmortization", 0)
 
         if deprication_and_amortization is None:
-            deprication_and_amortization = float(income_statement[latest_year].get("reconciledDepreciation", 0))
+            deprication_and_amortization = income_statement.number(0, "reconciledDepreciation", 0)
+
+        now = balance_sheet.offset(latest_year)
+        then = balance_sheet.offset(second_latest_year)
 
         # Ensure total_assets_now is not zero before proceeding to avoid ZeroDivisionError later
-        total_assets_now = float(balance_sheet[latest_year].get("totalAssets", 0))
+        total_assets_now = balance_sheet.number(now, "totalAssets", 0)
         if total_assets_now == 0:
             return {"cop_at": None}
 
-        total_liabilities_now = float(balance_sheet[latest_year].get("totalCurrentLiabilities", 0))
+        total_liabilities_now = balance_sheet.number(now, "totalCurrentLiabilities", 0)
 
-        total_assets_then = float(balance_sheet[second_latest_year].get("totalAssets", 0))
-        total_liabilities_then = float(balance_sheet[second_latest_year].get("totalCurrentLiabilities", 0))
+        total_assets_then = balance_sheet.number(then, "totalAssets", 0)
+        total_liabilities_then = balance_sheet.number(then, "totalCurrentLiabilities", 0)
 
         working_capital_now = total_assets_now - total_liabilities_now
         working_capital_then = total_assets_then - total_liabilities_then
@@ -633,30 +700,28 @@ def compute_cop_at_generous(data):
     THRESHOLD = 1  # cap extreme values
     
     try:
-        income_statement = data.get("Financials", {}).get("Income_Statement", {}).get("yearly", {})
-        balance_sheet = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+        view = as_fundamentals_view(data)
+        income_statement = view.statement("Income_Statement")
+        balance_sheet = view.statement("Balance_Sheet")
 
         # Ensure we have at least two years of data
         if len(income_statement) < 2 or len(balance_sheet) < 2:
             return {"cop_at_revised": None}
 
-        # Sort years (latest first)
-        sorted_years_income = sorted(income_statement.keys(), reverse=True)
-        sorted_years_balance = sorted(balance_sheet.keys(), reverse=True)
-
-        latest_year = sorted_years_income[0]
-        second_latest_year = sorted_years_income[1]
+        # Years are sorted latest first, balance sheet looked up on the income statement dates
+        now = balance_sheet.offset(income_statement.dates[0])
+        then = balance_sheet.offset(income_statement.dates[1])
 
         # Extract required values
-        ebit = income_statement[latest_year].get("ebit")
+        ebit = income_statement.get(0, "ebit")
         if ebit is None: 
-            ebit = float(income_statement[latest_year].get("operatingIncome", 0))
+            ebit = income_statement.number(0, "operatingIncome", 0)
     
-        total_assets_now = balance_sheet[latest_year].get("totalAssets")
-        netReceivables_now = balance_sheet[latest_year].get("netReceivables")
-        netReceivables_then = balance_sheet[second_latest_year].get("netReceivables")
-        inventory_now = balance_sheet[latest_year].get("inventory")
-        inventory_then = balance_sheet[second_latest_year].get("inventory")
+        total_assets_now = balance_sheet.get(now, "totalAssets")
+        netReceivables_now = balance_sheet.get(now, "netReceivables")
+        netReceivables_then = balance_sheet.get(then, "netReceivables")
+        inventory_now = balance_sheet.get(now, "inventory")
+        inventory_then = balance_sheet.get(then, "inventory")
 
         # If *any* required value is missing → return None
         required = [ebit, total_assets_now, netReceivables_now,
@@ -695,22 +760,22 @@ def compute_cop_at_generous(data):
 
 
 def get_operating_assets_helper(fundamental_data, year):
-    inc_data = fundamental_data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+    balance_sheet = as_fundamentals_view(fundamental_data).statement("Balance_Sheet")
 
     diff = int(CURRENT_YEAR) - year - 1
-    relevant_years = sorted(inc_data.keys(), reverse=True)[diff:(diff + 2)]
+    relevant_rows = balance_sheet.rows[diff:(diff + 2)]
     
     # Check if we have enough years of data
-    if len(relevant_years) < 2:
+    if len(relevant_rows) < 2:
         return [None, None]
 
     # totala tillgångar
-    last_year_total_assets = inc_data.get(relevant_years[0], {}).get("totalAssets")
-    second_latest_year_total_assets = inc_data.get(relevant_years[1], {}).get("totalAssets")
+    last_year_total_assets = relevant_rows[0].get("totalAssets")
+    second_latest_year_total_assets = relevant_rows[1].get("totalAssets")
   
     # kontanter och kortfristiga investeringar
-    last_year_cashAndShortTermInvestments = inc_data.get(relevant_years[0], {}).get("cashAndShortTermInvestments")
-    second_latest_year_cashAndShortTermInvestments = inc_data.get(relevant_years[1], {}).get("cashAndShortTermInvestments")
+    last_year_cashAndShortTermInvestments = relevant_rows[0].get("cashAndShortTermInvestments")
+    second_latest_year_cashAndShortTermInvestments = relevant_rows[1].get("cashAndShortTermInvestments")
     
     if None in [last_year_total_assets, second_latest_year_total_assets,
                 last_year_cashAndShortTermInvestments, second_latest_year_cashAndShortTermInvestments,
@@ -724,26 +789,26 @@ def get_operating_assets_helper(fundamental_data, year):
 
 # hjälpfunktion för NOA, beräknar operativa skulder
 def get_operating_liabilities_helper(fundamental_data, year):
-    inc_data = fundamental_data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+    balance_sheet = as_fundamentals_view(fundamental_data).statement("Balance_Sheet")
 
     diff = int(CURRENT_YEAR) - year - 1
-    relevant_years = sorted(inc_data.keys(), reverse=True)[diff:(diff + 2)]
+    relevant_rows = balance_sheet.rows[diff:(diff + 2)]
     
     # Check if we have enough years of data
-    if len(relevant_years) < 2:
+    if len(relevant_rows) < 2:
         return [None, None]
 
     # totala tillgångar
-    last_year_total_assets = inc_data.get(relevant_years[0], {}).get("totalAssets")
-    second_latest_year_total_assets = inc_data.get(relevant_years[1], {}).get("totalAssets")
+    last_year_total_assets = relevant_rows[0].get("totalAssets")
+    second_latest_year_total_assets = relevant_rows[1].get("totalAssets")
 
     # kortfristiga och långfristiga skulder
-    last_year_shortLongTermDebtTotal = inc_data.get(relevant_years[0], {}).get("shortLongTermDebtTotal")
-    second_latest_year_shortLongTermDebtTotal = inc_data.get(relevant_years[1], {}).get("shortLongTermDebtTotal")
+    last_year_shortLongTermDebtTotal = relevant_rows[0].get("shortLongTermDebtTotal")
+    second_latest_year_shortLongTermDebtTotal = relevant_rows[1].get("shortLongTermDebtTotal")
 
     # totala aktieägares eget kapital
-    last_year_totalStockholderEquity = inc_data.get(relevant_years[0], {}).get("totalStockholderEquity")
-    second_latest_year_totalStockholderEquity = inc_data.get(relevant_years[1], {}).get("totalStockholderEquity")
+    last_year_totalStockholderEquity = relevant_rows[0].get("totalStockholderEquity")
+    second_latest_year_totalStockholderEquity = relevant_rows[1].get("totalStockholderEquity")
 
     if None in [last_year_total_assets, second_latest_year_total_assets,
                 last_year_shortLongTermDebtTotal, second_latest_year_shortLongTermDebtTotal,
@@ -758,18 +823,18 @@ def get_operating_liabilities_helper(fundamental_data, year):
 
 # hjälpfunktion för NOA, beräknar totala tillgångar
 def get_total_assets_helper(fundamental_data, year):
-    inc_data = fundamental_data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
+    balance_sheet = as_fundamentals_view(fundamental_data).statement("Balance_Sheet")
 
     diff = int(CURRENT_YEAR) - year - 1
-    relevant_years = sorted(inc_data.keys(), reverse=True)[diff:(diff + 3)]
+    relevant_rows = balance_sheet.rows[diff:(diff + 3)]
     
     # Check if we have enough years of data
-    if len(relevant_years) < 3:
+    if len(relevant_rows) < 3:
         return [None, None, None]
 
-    last_year_total_assets = inc_data.get(relevant_years[0], {}).get("totalAssets")
-    second_latest_year_total_assets = inc_data.get(relevant_years[1], {}).get("totalAssets")
-    third_latest_year_total_assets = inc_data.get(relevant_years[2], {}).get("totalAssets")
+    last_year_total_assets = relevant_rows[0].get("totalAssets")
+    second_latest_year_total_assets = relevant_rows[1].get("totalAssets")
+    third_latest_year_total_assets = relevant_rows[2].get("totalAssets")
 
     if None in [last_year_total_assets, second_latest_year_total_assets, third_latest_year_total_assets]:
         return [None, None, None]
@@ -778,6 +843,8 @@ def get_total_assets_helper(fundamental_data, year):
 
 # NOA
 def get_NOA(fundamental_data):
+    # balansräkningen sorteras en gång och delas av de tre hjälpfunktionerna
+    fundamental_data = as_fundamentals_view(fundamental_data)
     year = int(CURRENT_YEAR) - 1
     operating_assets = get_operating_assets_helper(fundamental_data, year)
     operating_liabilities = get_operating_liabilities_helper(fundamental_data, year)
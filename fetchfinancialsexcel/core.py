@@ -8,180 +8,304 @@ from typing import List, Tuple, Optional, Dict, Any
 
 from . import company_data_extraction_EODH as eodh
 from . import data_analysis as analyse
+from .cache import ResponseCache, DEFAULT_MAX_BYTES
+from .client import EODHDClient, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from .async_engine import AsyncFetchEngine, DEFAULT_CONCURRENCY
+from .price_store import PriceStore
+from .price_series import as_price_series
+from .fundamentals_view import as_fundamentals_view
+from .fundamentals_filter import FUNDAMENTALS_MODES
+from .factor_store import FactorStore
+from .checkpoint import CheckpointJournal
+from .rate_limit import RateLimiter
+from .pipeline import StreamingPipeline
+from .indicator_pool import IndicatorPool
+from .retry import RetryPolicy, ErrorReport, DEFAULT_ATTEMPTS, DEFAULT_DEADLINE
+from .writer import write_output, check_output_format
+from .reader import read_tickers, Sheets
+from .fetch_plan import FetchPlan
+from .run_state import RunState, DEFAULT_MAX_AGE_DAYS, quote_bar_date
+from .ticker_index import TickerIndex, DEFAULT_TTL_DAYS, normalize_keyword
+from .name_matcher import NameMatcher, DEFAULT_MIN_CONFIDENCE
+
+ENGINES = ("threads", "async", "pipeline")
+
+# beräknar alla indikatorer för en ticker från redan hämtad data (ingen nätverkstrafik)
+def compute_company_indicators(company_ticker: str, data: Dict[str, Any], price_data: Any, price: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    price = price or {}
+    # kurserna konverteras en gång, månads- och årsaggregaten cachas på serien
+    price_data = as_price_series(price_data)
+    # fundamenta indexeras en gång (sorterade årsrapporter) och delas av alla indikatorer
+    data = as_fundamentals_view(data)
+    general = roce = pe = revenue = buybacks = ma = eps = total_yield = gross_p = accrual = asset_g = insiders = fcf = cop_at = cop_at_generous = noa = {}
+
+    try: 
+        general = eodh.get_selected_highlights(data)
+        print(f"Highlights fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching highlights: {e}")
+
+    try: 
+        roce = eodh.calculate_roce(data)
+        print(f"ROCE calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating ROCE: {e}")
+
+    try: 
+        pe = eodh.calculate_five_year_average_pe(company_ticker, data, price_data)
+        print(f"P/E ratio calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating P/E: {e}")
+
+    try: 
+        revenue = eodh.get_revenue_growth_data(data)
+        print(f"Revenue data fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching revenue data: {e}")
+    
+    try: 
+        eps = eodh.get_eps_growth_full(data)
+        print(f"EPS data fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching EPS data: {e}")
+    
+    try: 
+        fcf = eodh.fcf_yield_growth_latest(data)
+        print(f"FCF data fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching FCF data: {e}")
+    
+    try: 
+        buybacks = eodh.buyback_extensive(data)
+        print(f"Buyback data fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching buyback data: {e}")
+    
+    try: 
+        insiders = eodh.get_percent_insiders(data)
+        print(f"Insider data fetched for {company_ticker}.")
+    except Exception as e:
+        print(f"Error fetching insider data: {e}")
+
+    try: 
+        ma = eodh.get_moving_averages(data)
+        print(f"Moving averages calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating moving averages: {e}")
+
+    try: 
+        gross_p = eodh.gross_profitability(data)
+        print(f"Gross profitability calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating gross profitability: {e}")
+    
+    try: 
+        accrual = eodh.accruals(data)
+        print(f"Accruals calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating accruals: {e}")
+
+    try: 
+        asset_g = eodh.asset_growth(data)
+        print(f"Asset growth calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating asset growth: {e}")
+
+    try: 
+        total_yield = eodh.total_yield(data)
+        print(f"Total yield calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating total yield: {e}")
+
+    try: 
+        cop_at = eodh.compute_cop_at(data)
+        print(f"COP/AT calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating COP/AT: {e}")
+
+    try: 
+        cop_at_generous = eodh.compute_cop_at_generous(data)
+        print(f"COP/AT Revised calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating COP/AT Revised: {e}")
+
+    try: 
+        noa = eodh.get_NOA(data)
+        print(f"NOA calculated for {company_ticker}.")
+    except Exception as e:
+        print(f"Error calculating NOA: {e}")
+
+    # Fetch conservative components for later calculation
+    try: 
+        conservative_comps = analyse.conservative(data, price_data)
+    except Exception as e:
+        print(f"Error calculating conservative components: {e}")
+        conservative_comps = {}
+    
+    try: 
+        excess_returns = analyse.calculate_monthly_excess_returns(company_ticker, price_data)
+    except Exception as e:
+        print(f"Error calculating excess returns: {e}")
+        excess_returns = {}
+
+    # Combine all indicators
+    combined = {**price, **general, **roce, **pe, **revenue, **eps, **fcf, **buybacks, **insiders, **ma, **gross_p, **accrual, **asset_g, **total_yield, **cop_at, **cop_at_generous, **noa}
+    # store price data here
+    other = {**conservative_comps, **excess_returns}
+    
+    return combined, other
+
+# resultattabellens kolumner i utdataordning med typ, årskolumnerna följer CURRENT_YEAR
+def result_columns() -> Dict[str, str]:
+    year = int(eodh.CURRENT_YEAR)
+    columns = {"Bolag": "object", "Ticker": "object", "Price": "float64", "Currency": "object", "Sector": "object"}
+    numeric = [
+        "ROE", "Rörelsemarginal", "Direktavkastning", "Utdelning", "MarketCap (mln)", "ROCE",
+        f"PE {year}", "PE Genomsnitt (5y)", f"RPS {year}", f"RPS {year + 1}", "RPS Genomsnitt (5y)",
+        f"EPS Growth {year}", f"EPS Growth {year + 1}", "EPS Genomsnitt (5y)", "FCF Yield", "FCF Yield Genomsnitt (5y)",
+        "Förändring antal aktier 1y", "Förändring antal aktier 3y", "Förändring antal aktier 5y", "Andel Insiders",
+        "200 Day MA", "50 Day MA", "Bruttovinstmarginal", "Accruals", "Tillgångstillväxt", "Total Avkastning",
+        "cop_at", "cop_at_revised", "NOA_GR1A",
+    ]
+    columns.update((name, "float64") for name in numeric)
+    return columns
+
+# bygger resultattabellen en gång från radposter i stället för en concat per rad
+def records_to_frame(rows: List[Dict[str, Any]], columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    # alla kolumner i result_columns finns alltid med sin typ, även om inget bolag har värden;
+    # okända nycklar läggs sist i den ordning de först förekommer
+    columns = result_columns() if columns is None else columns
+    extra = [key for key in dict.fromkeys(key for row in rows for key in row) if key not in columns]
+    frame = pd.DataFrame.from_records(rows, columns=list(columns) + extra)
+    for name, dtype in columns.items():
+        try:
+            frame[name] = frame[name].astype(dtype)
+        except (TypeError, ValueError):
+            # text i en numerisk kolumn, kolumnen behålls som den är
+            print(f"Column {name} could not be converted to {dtype}, keeping {frame[name].dtype}.")
+    return frame
 
 class FundamentalDataFetcher:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        cache_dir: Optional[str] = None,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        pool_size: int = 10,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        price_store_dir: Optional[str] = None,
+        factor_store_dir: Optional[str] = None,
+        factors_file: Optional[str] = None,
+        rate_limit: Optional[float] = None,
+        retry_attempts: int = DEFAULT_ATTEMPTS,
+        retry_deadline: float = DEFAULT_DEADLINE,
+        compute_processes: int = 0,
+        fundamentals_mode: str = "full",
+        state_dir: Optional[str] = None,
+        state_max_age: float = DEFAULT_MAX_AGE_DAYS,
+        ticker_index: Optional[str] = None,
+        ticker_index_ttl: float = DEFAULT_TTL_DAYS,
+        match_confidence: float = DEFAULT_MIN_CONFIDENCE
+    ):
         self.api_key = api_key
         self.current_date = datetime.today().strftime("%Y-%m-%d")
         eodh.API_KEY = api_key
+        # disk-cache för råa API-svar, avstängd om ingen katalog anges
+        self.cache = ResponseCache(cache_dir, ttls=cache_ttls, max_bytes=cache_max_bytes) if cache_dir else None
+        # gemensam gräns för API-anrop per minut och samtidiga förfrågningar, av som standard (rate_limit 0/None)
+        self.limiter = RateLimiter(rate_limit, max_concurrency=pool_size) if rate_limit else None
+        # en gemensam klient med connection pool för alla anrop
+        self.client = EODHDClient(
+            api_key,
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            cache=self.cache,
+            limiter=self.limiter,
+            retry=RetryPolicy(attempts=retry_attempts, deadline=retry_deadline)
+        )
+        # misslyckade anrop per ticker, efter alla omförsök
+        self.errors = ErrorReport()
+        # "slim"/"filter" behåller bara de fundamentasektioner indikatorerna läser
+        if fundamentals_mode not in FUNDAMENTALS_MODES:
+            raise ValueError(f"fundamentals_mode must be one of {', '.join(FUNDAMENTALS_MODES)}")
+        self.fundamentals_mode = fundamentals_mode
+        # lokal kurshistorik, bara saknade dagar hämtas om den är aktiverad
+        self.price_store = PriceStore(price_store_dir) if price_store_dir else None
+        # Fama-French-faktorer från lokal lagring eller fil (offline) i stället för varje körning
+        if factor_store_dir or factors_file:
+            self.factor_store = FactorStore(factor_store_dir, offline_path=factors_file)
+        else:
+            self.factor_store = None
+        # indikatorerna beräknas i separata processer om compute_processes > 0
+        self.indicator_pool = IndicatorPool(compute_processes) if compute_processes > 0 else None
+        # journal över färdiga tickers, sätts av process_excel_file
+        self.checkpoint: Optional[CheckpointJournal] = None
+        # föregående körningars indata och indikatorer, bara ändrade tickers hämtas om (delta)
+        self.run_state = RunState(state_dir, max_age_days=state_max_age) if state_dir else None
+        # sökresultat sparade mellan körningar, kända ISIN/namn/tickers slås upp lokalt
+        self.ticker_index = TickerIndex(ticker_index, ttl_days=ticker_index_ttl) if ticker_index else None
+        # bolagsnamn matchas lokalt mot indexets namn, bara osäkra matchningar går till search
+        self.match_confidence = match_confidence
+        self._name_matcher: Optional[NameMatcher] = None
+        self._name_matcher_lock = Lock()
         self._search_cache: Dict[str, Optional[str]] = {}
         self._search_cache_lock = Lock()
     
-    def extract_tickers_from_excel(self, file_path):
-        df = pd.read_excel(file_path, header=None)
-        tickers = []
-        company_list = []
-        isin_list = []
-        
-        for index, row in df.iterrows():
-            if index < 1:
-                continue
-                
-            company = ""
-            if len(row) > 0 and not pd.isna(row[0]):
-                company = str(row[0]).strip().upper()
-
-            ticker = ""
-            if len(row) > 1 and not pd.isna(row[1]):
-                ticker = str(row[1]).strip().upper()
-                ticker = ''.join(c for c in ticker if c.isalpha() or c.isdigit() or c == '.' or c == '-')
-                ticker = ticker.strip('.-')
-
-            isin = None
-            if len(row) > 2 and not pd.isna(row[2]):
-                isin = str(row[2]).strip().upper()
-
-            if not any([company, ticker, isin]):
-                continue
-            
-            tickers.append(ticker)
-            company_list.append(company)
-            isin_list.append(isin)
-                
-        return company_list, tickers, isin_list
+    # Excel (alla eller valda flikar), CSV eller Parquet, kolumnerna bolagsnamn, ticker, ISIN
+    def extract_tickers_from_excel(self, file_path, sheets: Sheets = None):
+        return read_tickers(file_path, sheets)
     
-    def fetch_company_data(self, company_ticker):
+    # resultat som inte behöver räknas om: journalförda eller oförändrade sedan föregående körning
+    def _completed(self, company_ticker: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        if self.checkpoint is not None and company_ticker in self.checkpoint:
+            return self.checkpoint.get(company_ticker)
+        if self.run_state is not None:
+            return self.run_state.result(company_ticker)
+        return None
+
+    def fetch_company_data(self, company_ticker, quotes: Optional[Dict[str, Dict[str, Any]]] = None):
+        # redan klar i en tidigare körning
+        done = self._completed(company_ticker)
+        if done is not None:
+            return done
+
+        data, price_data, price = self._download_company_data(company_ticker, quotes)
+        return self._compute_company_data(company_ticker, data, price_data, price)
+
+    def _download_company_data(self, company_ticker, quotes: Optional[Dict[str, Dict[str, Any]]] = None):
         # Fetch fundamental and price data
-        data = eodh.fetch_fundamentals(company_ticker)
-        price_data = eodh.fetch_price_data(company_ticker)
+        data = eodh.fetch_fundamentals(company_ticker, client=self.client, mode=self.fundamentals_mode,
+                                       run_state=self.run_state, error_report=self.errors)
+        price_data = eodh.fetch_price_data(company_ticker, client=self.client, price_store=self.price_store,
+                                           error_report=self.errors)
 
-        # Initialize empty dictionaries
-        price = general = roce = pe = revenue = buybacks = ma = eps = total_yield = gross_p = accrual = asset_g = insiders = fcf = cop_at = cop_at_generous = noa = {}
-        
-        # Fetch all indicators with error handling
+        price = {}
         try: 
-            price = eodh.real_time_price(company_ticker, data)
+            price = eodh.real_time_price(company_ticker, data, client=self.client, quotes=quotes,
+                                         error_report=self.errors)
             print(f"Price data fetched for {company_ticker}.")
         except Exception as e:
             print(f"Error fetching price data: {e}")
 
-        try: 
-            general = eodh.get_selected_highlights(data)
-            print(f"Highlights fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching highlights: {e}")
-
-        try: 
-            roce = eodh.calculate_roce(data)
-            print(f"ROCE calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating ROCE: {e}")
-
-        try: 
-            pe = eodh.calculate_five_year_average_pe(company_ticker, data, price_data)
-            print(f"P/E ratio calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating P/E: {e}")
-
-        try: 
-            revenue = eodh.get_revenue_growth_data(data)
-            print(f"Revenue data fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching revenue data: {e}")
-        
-        try: 
-            eps = eodh.get_eps_growth_full(data)
-            print(f"EPS data fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching EPS data: {e}")
-        
-        try: 
-            fcf = eodh.fcf_yield_growth_latest(data)
-            print(f"FCF data fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching FCF data: {e}")
-        
-        try: 
-            buybacks = eodh.buyback_extensive(data)
-            print(f"Buyback data fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching buyback data: {e}")
-        
-        try: 
-            insiders = eodh.get_percent_insiders(data)
-            print(f"Insider data fetched for {company_ticker}.")
-        except Exception as e:
-            print(f"Error fetching insider data: {e}")
-
-        try: 
-            ma = eodh.get_moving_averages(data)
-            print(f"Moving averages calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating moving averages: {e}")
-
-        try: 
-            gross_p = eodh.gross_profitability(data)
-            print(f"Gross profitability calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating gross profitability: {e}")
-        
-        try: 
-            accrual = eodh.accruals(data)
-            print(f"Accruals calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating accruals: {e}")
+        return data, price_data, price
 
-        try: 
-            asset_g = eodh.asset_growth(data)
-            print(f"Asset growth calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating asset growth: {e}")
-
-        try: 
-            total_yield = eodh.total_yield(data)
-            print(f"Total yield calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating total yield: {e}")
-
-        try: 
-            cop_at = eodh.compute_cop_at(data)
-            print(f"COP/AT calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating COP/AT: {e}")
-
-        try: 
-            cop_at_generous = eodh.compute_cop_at_generous(data)
-            print(f"COP/AT Revised calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating COP/AT Revised: {e}")
-
-        try: 
-            noa = eodh.get_NOA(data)
-            print(f"NOA calculated for {company_ticker}.")
-        except Exception as e:
-            print(f"Error calculating NOA: {e}")
-
-        # Fetch conservative components for later calculation
-        try: 
-            conservative_comps = analyse.conservative(data, price_data)
-        except Exception as e:
-            print(f"Error calculating conservative components: {e}")
-            conservative_comps = {}
-        
-        try: 
-            excess_returns = analyse.calculate_monthly_excess_returns(company_ticker, price_data)
-        except Exception as e:
-            print(f"Error calculating excess returns: {e}")
-            excess_returns = {}
-
-        # Combine all indicators
-        combined = {**price, **general, **roce, **pe, **revenue, **eps, **fcf, **buybacks, **insiders, **ma, **gross_p, **accrual, **asset_g, **total_yield, **cop_at, **cop_at_generous, **noa}
-        # store price data here
-        other = {**conservative_comps, **excess_returns}
-        
+    def _compute_company_data(self, company_ticker, data, price_data, price):
+        if self.indicator_pool is not None:
+            combined, other = self.indicator_pool.compute(company_ticker, data, price_data, price)
+        else:
+            combined, other = compute_company_indicators(company_ticker, data, price_data, price)
+        # tickers med tillfälliga fel journalförs inte, så --resume försöker igen
+        if not self.errors.has_transient(company_ticker):
+            if self.checkpoint is not None:
+                self.checkpoint.record(company_ticker, combined, other)
+            if self.run_state is not None:
+                self.run_state.save(company_ticker, data, price_data, combined, other)
         return combined, other
     
-    def add_company_data(self, data_df: pd.DataFrame, company_name: str, company_ticker: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    def _company_row(self, company_name: str, company_ticker: str, indicators: Optional[Dict[str, Any]], other: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         company_data = {
             'Bolag': company_name,
             'Ticker': company_ticker
@@ -191,17 +315,22 @@ class FundamentalDataFetcher:
             'Ticker': company_ticker
         }
 
+        if indicators is not None:
+            company_data.update(indicators)
+            company_data_separate.update(other or {})
+        elif company_ticker:
+            print(f"No data found for {company_ticker}, adding empty row.")
+
+        return company_data, company_data_separate
+
+    def add_company_data(self, data_df: pd.DataFrame, company_name: str, company_ticker: str, quotes: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         if not company_ticker:
+            company_data, company_data_separate = self._company_row(company_name, company_ticker, None, None)
             data_df = pd.concat([data_df, pd.DataFrame([company_data])], ignore_index=True)
             return data_df, company_data_separate
 
-        indicators, other = self.fetch_company_data(company_ticker)
-
-        if indicators is not None:
-            company_data.update(indicators)
-            company_data_separate.update(other)
-        else:
-            print(f"No data found for {company_ticker}, adding empty row.")
+        indicators, other = self.fetch_company_data(company_ticker, quotes=quotes)
+        company_data, company_data_separate = self._company_row(company_name, company_ticker, indicators, other)
 
         try:
             data_df = pd.concat([data_df, pd.DataFrame([company_data])], ignore_index=True)
@@ -211,33 +340,163 @@ class FundamentalDataFetcher:
 
         return data_df, company_data_separate
     
-    def fetch_all_data(self, company_list: List[str], ticker_list: List[str], max_workers: int = 10) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
-        data_df = pd.DataFrame()
+    def _company_rows(self, company_list: List[str], ticker_list: List[str],
+                      results: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+        rows = []
         separate_data_list = []
+        for company, ticker, result in zip(company_list, ticker_list, results):
+            indicators, other = result if result is not None else (None, None)
+            company_data, company_data_separate = self._company_row(company, ticker, indicators, other)
+            rows.append(company_data)
+            separate_data_list.append(company_data_separate)
+        return records_to_frame(rows), separate_data_list
+    
+    def fetch_all_data(self, company_list: List[str], ticker_list: List[str], max_workers: int = 10) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+        # varje unik ticker hämtas och beräknas en gång, resultatet delas av alla dess rader
+        plan = FetchPlan(ticker_list)
+        if plan.duplicates:
+            print(f"Fetch plan: {plan.summary()}")
 
-        # Combine company names and tickers
-        combined = list(zip(company_list, ticker_list))
+        self.client.ensure_pool_size(max_workers)
 
-        def process_company(args):
-            company, ticker = args
-            return self.add_company_data(pd.DataFrame(), company, ticker)
+        # realtidskurser hämtas i klump innan per-ticker-bearbetningen
+        pending = [t for t in plan.tickers if self._completed(t) is None]
+        quotes = eodh.fetch_real_time_quotes(pending, client=self.client, max_workers=max_workers)
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(process_company, combined))
+        def process_ticker(ticker):
+            return self.fetch_company_data(ticker, quotes=quotes)
 
-        for df, separate_data in results:
-            data_df = pd.concat([data_df, df], ignore_index=True)
-            separate_data_list.append(separate_data)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process_ticker, plan.tickers))
 
-        return data_df, separate_data_list
+        return self._company_rows(company_list, ticker_list, plan.fan_out(results))
+    
+    def fetch_all_data_async(self, company_list: List[str], ticker_list: List[str], concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+        plan = FetchPlan(ticker_list)
+        if plan.duplicates:
+            print(f"Fetch plan: {plan.summary()}")
+
+        done = {t: self._completed(t) for t in plan.tickers}
+        pending = [t for t in plan.tickers if done[t] is None]
+        engine = AsyncFetchEngine(self.client, concurrency=concurrency, price_store=self.price_store,
+                                  fundamentals_mode=self.fundamentals_mode, run_state=self.run_state,
+                                  error_report=self.errors)
+        results = engine.run(pending, self._compute_company_data)
+        for ticker, result in done.items():
+            if ticker not in results and result is not None:
+                results[ticker] = result
+
+        unique_results = [results.get(t) for t in plan.tickers]
+        return self._company_rows(company_list, ticker_list, plan.fan_out(unique_results))
     
+    def fetch_all_data_pipeline(
+        self,
+        company_list: List[str],
+        ticker_list: List[str],
+        isin_list: Optional[List[Optional[str]]] = None,
+        max_workers: int = 10,
+        resolve: bool = True
+    ) -> Tuple[List[str], pd.DataFrame, List[Dict[str, Any]]]:
+        # sök, hämtning och indikatorer överlappar, se StreamingPipeline
+        self.client.ensure_pool_size(max_workers)
+        # en indikatortråd per arbetsprocess, så att poolen hålls sysselsatt
+        compute_workers = self.indicator_pool.processes if self.indicator_pool is not None else max_workers
+        stream = StreamingPipeline(
+            fetch=self._download_company_data,
+            compute=self._compute_company_data,
+            fetch_quotes=lambda tickers: eodh.fetch_real_time_quotes(tickers, client=self.client, max_workers=1),
+            resolve=self.resolve_ticker if resolve else None,
+            completed=self._completed,
+            search_workers=max_workers,
+            fetch_workers=max_workers,
+            compute_workers=compute_workers
+        )
+        resolved, results = stream.run(company_list, ticker_list, isin_list)
+        if stream.duplicates:
+            print(f"Fetch plan: {FetchPlan(resolved).summary()}")
+
+        df, separate_data_list = self._company_rows(company_list, resolved, results)
+        return resolved, df, separate_data_list
+    
+    # fyller på kurshistoriken för hela börser med en bulk-förfrågan per börs
+    def seed_prices(self, ticker_list: List[str]) -> int:
+        if self.price_store is None:
+            print("No price store configured, skipping bulk price seeding.")
+            return 0
+
+        exchanges = sorted({t.rsplit('.', 1)[1] for t in ticker_list if t and '.' in t})
+        extended = 0
+        for exchange in exchanges:
+            try:
+                count = self.price_store.seed_exchange(exchange, self.client)
+                print(f"Seeded {count} price histories from bulk data for {exchange}")
+                extended += count
+            except Exception as e:
+                print(f"Error seeding bulk prices for {exchange}: {e}")
+        return extended
+    
+    # fyller tickerindexet från börsernas symbollistor, en förfrågan per börs
+    def seed_ticker_index(self, exchanges: List[str]) -> int:
+        if self.ticker_index is None:
+            print("No ticker index configured, skipping symbol list seeding.")
+            return 0
+        seeded = self.ticker_index.seed(exchanges, self.client)
+        with self._name_matcher_lock:
+            self._name_matcher = None
+        return seeded
+    
+    # byggs en gång från indexets bolagsnamn, None utan index eller namn
+    def name_matcher(self) -> Optional[NameMatcher]:
+        if self.ticker_index is None:
+            return None
+        with self._name_matcher_lock:
+            if self._name_matcher is None:
+                self._name_matcher = NameMatcher(self.ticker_index.names())
+            return self._name_matcher if len(self._name_matcher) else None
+    
+    def match_name(self, company_name: str) -> Tuple[Optional[str], float]:
+        matcher = self.name_matcher()
+        return matcher.match(company_name) if matcher is not None else (None, 0.0)
+    
+    # delta-uppdatering: jämför varje tickers indata med föregående körning innan något hämtas
+    def plan_refresh(self, ticker_list: List[str], max_workers: int = 10) -> Dict[str, int]:
+        state = self.run_state
+        if state is None:
+            return {}
+
+        tickers = list(dict.fromkeys(t for t in ticker_list if t))
+        # bara tickers med en färsk sparad post behöver kontrolleras
+        candidates = []
+        for ticker in tickers:
+            entry = state.get(ticker)
+            if entry is None or state.is_stale(entry):
+                state.plan(ticker, None, None)
+            else:
+                candidates.append(ticker)
+
+        # senaste handelsdag från realtidskurserna (i klump), UpdatedAt med en liten filtrerad förfrågan
+        quotes = eodh.fetch_real_time_quotes(candidates, client=self.client, max_workers=max_workers)
+
+        def check(ticker):
+            updated_at = eodh.fetch_fundamentals_updated_at(ticker, client=self.client)
+            state.plan(ticker, updated_at, quote_bar_date(quotes.get(ticker.upper())))
+
+        self.client.ensure_pool_size(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(check, candidates))
+
+        counts = state.counts()
+        print(f"Delta refresh: {counts['reuse']} unchanged, {counts['prices']} with new prices only, "
+              f"{counts['full']} refetched in full")
+        return counts
+
     def analyze_data(self, df, separate_data_list, factor_country="US"):
         
         # Create COP/AT Revised composite score
         df_analyzed = analyse.create_cop_at_noa_composite_score(df)
 
         # Residual momentum
-        df_analyzed = analyse.residual_momentum(factor_country, df_analyzed, separate_data_list)
+        df_analyzed = analyse.residual_momentum(factor_country, df_analyzed, separate_data_list, self.factor_store)
         
         # Apply Greenblatt formula
         df_analyzed = analyse.greenblatt_formula(df_analyzed)
@@ -255,19 +514,18 @@ class FundamentalDataFetcher:
 
 
     def search(self, keyword):
+        return self._search(keyword)[1]
 
-        url = f'https://eodhd.com/api/search/{keyword}?limit=1&api_token={self.api_key}&fmt=json'
-        
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status() 
+    # (svarade, ticker): bara ett faktiskt svar utan träff får sparas som negativt resultat
+    def _search(self, keyword) -> Tuple[bool, Optional[str]]:
 
-            data = response.json()
+        try:
+            data = self.client.get(f"search/{keyword}", {"limit": 1}).json()
             
             # kontrollera att svaret är en lista med minst ett element
             if not isinstance(data, list) or len(data) == 0:
                 print(f"Inget resultat för sökordet: {keyword}")
-                return None
+                return True, None
 
             # Kontrollera att nyckeln 'Code' finns
             company_code = data[0].get('Code')
@@ -277,33 +535,44 @@ class FundamentalDataFetcher:
 
             if not company_code or not exchange:
                 print(f"Inget fält 'Code' hittades i svaret: {data[0]}")
-                return None
+                return True, None
 
-            return ticker
+            return True, ticker
 
         except requests.exceptions.RequestException as e:
             print(f"Nätverksfel: {e}")
-            return None
+            self.errors.record(keyword, "search", e)
+            return False, None
         except ValueError:
             print("Fel vid avkodning av JSON.")
-            return None
+            return False, None
         except Exception as e:
             print(f"Oväntat fel: {e}")
-            return None
+            return False, None
     
     # ger det bästa resultatet, ticker från ISIN/namn/ticker
     def resolve_ticker(self, company_name: Optional[str], fallback_ticker: str, isin: Optional[str] = None) -> str:
-        for keyword in (isin, fallback_ticker, company_name):
+        for keyword, is_name in ((isin, False), (fallback_ticker, False), (company_name, True)):
             if keyword:
-                normalized = keyword.upper()
+                normalized = normalize_keyword(keyword)
                 with self._search_cache_lock:
                     if normalized in self._search_cache:
                         cached = self._search_cache[normalized]
                         if cached:
                             return cached
                         continue
-                resolved = self.search(keyword)
-                resolved_upper = resolved.upper() if resolved else None
+                known = False
+                if self.ticker_index is not None:
+                    known, resolved_upper = self.ticker_index.lookup(normalized)
+                if not known and is_name:
+                    matched, confidence = self.match_name(keyword)
+                    known = matched is not None and confidence >= self.match_confidence
+                    resolved_upper = matched if known else None
+                if not known:
+                    answered, resolved = self._search(keyword)
+                    resolved_upper = resolved.upper() if resolved else None
+                    if answered and self.ticker_index is not None:
+                        self.ticker_index.record(normalized, resolved_upper, name=is_name)
                 with self._search_cache_lock:
                     self._search_cache[normalized] = resolved_upper
                 if resolved_upper:
@@ -318,6 +587,7 @@ class FundamentalDataFetcher:
         max_workers: int = 8
     ) -> List[str]:
         results: List[str] = [""] * len(ticker_list)
+        self.client.ensure_pool_size(max_workers)
 
         def resolve_index(idx: int) -> Tuple[int, str]:
             ticker = ticker_list[idx]
@@ -332,79 +602,99 @@ class FundamentalDataFetcher:
 
         return results
     
-    def process_excel_file(self, input_file: str, output_file: str, max_workers: int = 10, factor_country: str = "US") -> None:
+    def process_excel_file(
+        self,
+        input_file: str,
+        output_file: str,
+        max_workers: int = 10,
+        factor_country: str = "US",
+        engine: str = "threads",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        seed_prices: bool = False,
+        checkpoint_file: Optional[str] = None,
+        resume: bool = False,
+        error_report_file: Optional[str] = None,
+        output_format: Optional[str] = None,
+        seed_index: Optional[List[str]] = None,
+        input_sheets: Sheets = None
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        # fel format eller saknad pyarrow ska upptäckas innan något hämtas
+        output_format = check_output_format(output_file, output_format)
+
         print(f"Processing file: {input_file}")
+        self.errors.clear()
         
         # Extract tickers from Excel file
-        company_list, ticker_list, isin_list = self.extract_tickers_from_excel(input_file)
+        company_list, ticker_list, isin_list = self.extract_tickers_from_excel(input_file, input_sheets)
+
+        if seed_index:
+            self.seed_ticker_index(seed_index)
 
-        # använd search på ticker_list
-        ticker_list = self.process_ticker_list_using_search_api(ticker_list, company_list, isin_list, max_workers)
+        # pipeline-motorn söker medan den hämtar, utom när kurserna ska fyllas på per börs
+        # eller delta-planen göras först, båda behöver de färdiga tickers
+        streaming = engine == "pipeline" and not seed_prices and self.run_state is None
+        if not streaming:
+            # använd search på ticker_list
+            ticker_list = self.process_ticker_list_using_search_api(ticker_list, company_list, isin_list, max_workers)
 
         print(f"Found {len(ticker_list)} tickers to process")
+
+        if seed_prices:
+            self.seed_prices(ticker_list)
+
+        if self.run_state is not None:
+            self.plan_refresh(ticker_list, max_workers)
         
+        # varje färdig ticker journalförs så att en avbruten körning kan återupptas
+        if checkpoint_file:
+            self.checkpoint = CheckpointJournal(checkpoint_file, resume=resume)
+
         # Fetch all data
         print("Fetching financial data...")
-        df, separate_data_list = self.fetch_all_data(company_list, ticker_list, max_workers)
+        try:
+            if engine == "pipeline":
+                ticker_list, df, separate_data_list = self.fetch_all_data_pipeline(
+                    company_list, ticker_list, isin_list, max_workers, resolve=streaming)
+            elif engine == "async":
+                df, separate_data_list = self.fetch_all_data_async(company_list, ticker_list, concurrency)
+            else:
+                df, separate_data_list = self.fetch_all_data(company_list, ticker_list, max_workers)
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+            if self.indicator_pool is not None:
+                self.indicator_pool.close()
         
         # Analyze data
         print("Performing financial analysis...")
         df_analyzed = self.analyze_data(df, separate_data_list, factor_country)
         
-        # Clean data before saving to Excel
+        # xlsx, Parquet, Arrow eller CSV efter output_format eller filändelsen
         print(f"Saving results to: {output_file}")
-        
-        # Comprehensive data cleaning to prevent Excel XML errors
-        import numpy as np
-        df_cleaned = df_analyzed.copy()
-        
-        # Debug: Check for problematic data types and values
-        print("Debug: Checking for problematic values...")
-        problematic_cols = []
-        for col in df_cleaned.columns:
-            if df_cleaned[col].dtype == 'object':
-                # Check for very long strings that might cause issues
-                max_length = df_cleaned[col].astype(str).str.len().max()
-                if max_length > 1000:
-                    problematic_cols.append(f"{col} (long strings: max {max_length})")
-            
-            # Check for inf values
-            if pd.api.types.is_numeric_dtype(df_cleaned[col]):
-                inf_count = np.isinf(df_cleaned[col]).sum()
-                if inf_count > 0:
-                    problematic_cols.append(f"{col} (inf values: {inf_count})")
-        
-        if problematic_cols:
-            print(f"Found potentially problematic columns: {problematic_cols}")
-        
-        # Replace inf, -inf, and NaN with None for Excel compatibility
-        df_cleaned = df_cleaned.replace([float('inf'), float('-inf'), np.inf, -np.inf], None)
-        
-        # Handle any remaining NaN values
-        df_cleaned = df_cleaned.where(pd.notnull(df_cleaned), None)
-        
-        # Clean column names - remove/replace problematic characters
-        df_cleaned.columns = [str(col).strip().replace('/', '_').replace('\\', '_').replace('*', '_').replace('[', '_').replace(']', '_').replace(':', '_').replace('?', '_') for col in df_cleaned.columns]
-        
-        # Convert any complex data types to strings
-        for col in df_cleaned.columns:
-            if df_cleaned[col].dtype == 'object':
-                df_cleaned[col] = df_cleaned[col].astype(str)
-                # Replace 'None' strings back to actual None
-                df_cleaned[col] = df_cleaned[col].replace('None', None)
-        
-        # Try writing with different engines in case of issues
-        try:
-            df_cleaned.to_excel(output_file, index=False, engine='openpyxl')
-        except Exception as e:
-            print(f"Error with openpyxl engine: {e}")
-            print("Trying with xlsxwriter engine...")
-            try:
-                df_cleaned.to_excel(output_file, index=False, engine='xlsxwriter')
-            except Exception as e2:
-                print(f"Error with xlsxwriter engine: {e2}")
-                # Fallback to CSV if Excel fails
-                csv_file = output_file.replace('.xlsx', '.csv')
-                print(f"Saving as CSV instead: {csv_file}")
-                df_cleaned.to_csv(csv_file, index=False)
+        write_output(df_analyzed, output_file, output_format)
+
+        # resultatet är sparat, journalen behövs inte längre
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+            self.checkpoint = None
+
+        if self.ticker_index is not None:
+            self.ticker_index.close()
+            print(f"Ticker index: {self.ticker_index.hits} hits, {self.ticker_index.misses} misses")
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+        if len(self.errors):
+            tickers = {f['ticker'] for f in self.errors.failures}
+            print(f"{len(self.errors)} failed requests for {len(tickers)} tickers")
+            if error_report_file:
+                self.errors.write(error_report_file)
+                print(f"Error report saved to: {error_report_file}")
+        if self.limiter is not None:
+            stats = self.limiter.stats()
+            print(f"Requests: {stats['requests']} ({stats['api_calls']} API calls) in {stats['elapsed']:.1f}s, "
+                  f"{stats['requests_per_second']:.1f} req/s, {stats['calls_per_second']:.1f} calls/s, "
+                  f"{stats['throttled']} throttled, concurrency limit {stats['concurrency_limit']}")
         print("Processing complete!") 
\ No newline at end of file
@@ -1,15 +1,13 @@
 import pandas as pd
 from datetime import datetime
-from collections import defaultdict
-import statistics as stats
-from datetime import timedelta
 import statistics as stats
 import numpy as np
 
-import statsmodels.api as sm
-from sklearn.preprocessing import StandardScaler
 import pandas_datareader.data as web
 
+from .price_series import as_price_series
+from .fundamentals_view import as_fundamentals_view
+
 
 now = datetime.today()
 CURRENT_YEAR = now.strftime("%Y")
@@ -17,7 +15,8 @@ CURRENT_YEAR = now.strftime("%Y")
 # Greenblatt Magic Formula number 
 def greenblatt_formula(df): 
     
-    df = df.copy()
+    # grund kopia, bara den nya kolumnen läggs till
+    df = df.copy(deep=False)
     
     # Mask för rader där PE och ROE är varken None eller 0
     valid_mask = (
@@ -27,80 +26,60 @@ def greenblatt_formula(df):
         (df["ROCE"] != 0)
     )
 
-    # Initiera kolumn med None
-    df["Greenblatt Formula"] = None
-
-    # Rangordna bara giltiga rader
-    PE_rank = df.loc[valid_mask, f"PE {CURRENT_YEAR}"].rank(ascending=True, method="min")
-    ROE_rank = df.loc[valid_mask, "ROE"].rank(ascending=False, method="min")
+    # Rangordna bara giltiga rader, övriga blir NaN och räknas inte i ranken
+    PE_rank = df[f"PE {CURRENT_YEAR}"].where(valid_mask).rank(ascending=True, method="min")
+    ROE_rank = df["ROE"].where(valid_mask).rank(ascending=False, method="min")
 
-    # Summera rank och skriv in i nya kolumnen för giltiga rader
-    for idx in PE_rank.index:
-        df.at[idx, "Greenblatt Formula"] = PE_rank[idx] + ROE_rank[idx]
+    # Summera rank, NaN för ogiltiga rader
+    df["Greenblatt Formula"] = PE_rank + ROE_rank
 
     return df
 
 # standardavvikelsen av monethly return de senaste 36 månaderna 
 # rank in ascending order 
 def volatility(price_data):
-    if len(price_data) < 38:  # Behöver minst 38 dagars data för 36 månaders tillväxt
+    series = as_price_series(price_data)
+    if len(series) < 38:  # Behöver minst 38 dagars data för 36 månaders tillväxt
         return None, [], []
 
     try:
-        for d in price_data:
-            if isinstance(d['date'], str):
-                d['date'] = datetime.strptime(d['date'], '%Y-%m-%d')
-
-        price_data.sort(key=lambda x: x['date'])
-
-        monthly_data = defaultdict(list)
-        for entry in price_data:
-            key = (entry['date'].year, entry['date'].month)
-            monthly_data[key].append(entry)
-
-        last_day_adj_closes = [entries[-1]['adjusted_close'] for key, entries in sorted(monthly_data.items())]
+        last_day_adj_closes = series.month_end_closes()
         last_36_adj_closes = last_day_adj_closes[-38:]
 
         if len(last_36_adj_closes) < 14:
             return None, [], []
 
-        monthly_growths = []
-        for idx in range(1, len(last_36_adj_closes)-1):
-            growth = last_36_adj_closes[idx+1] / last_36_adj_closes[idx] - 1
-            monthly_growths.append(growth)
+        monthly_growths = (last_36_adj_closes[2:] / last_36_adj_closes[1:-1] - 1).tolist()
 
         std = stats.stdev(monthly_growths)
-        return std, last_36_adj_closes, monthly_growths
+        return std, last_36_adj_closes.tolist(), monthly_growths
 
     except Exception:
         return None, [], []
 
 # NPY - formel från artikeln "formula investing"
 def NPY(closing_prices, data, price_data): 
+    series = as_price_series(price_data)
+
     def find_adjusted_close_on_or_after(date, stock_prices):
-        # Convert to set of available dates for faster lookup
-        available_dates = {entry['date'].date(): entry['adjusted_close'] for entry in stock_prices}
-        
-        # Start at the given date and move forward until found
-        while date.date() not in available_dates:
-            date += timedelta(days=1)
-        
-        return available_dates[date.date()]
+        # första handelsdagen på eller efter datumet
+        idx = np.searchsorted(stock_prices.dates, np.datetime64(date.date(), "D"), side="left")
+        if idx >= len(stock_prices):
+            raise ValueError(f"No price on or after {date.date()}")
+        return stock_prices.adjusted_close[idx]
    
     N = len(closing_prices)
     R = closing_prices[N-1] / closing_prices[N-13] - 1
-    inc_data = data.get("Financials", {}).get("Balance_Sheet", {}).get("yearly", {})
-    
-    sorted_Years = sorted(inc_data.items(), reverse=True)[0:2]
+    sorted_Years = as_fundamentals_view(data).statement("Balance_Sheet").rows[0:2]
 
-    latest_year = sorted_Years[0][1].get("commonStockSharesOutstanding")
-    date_last_year= datetime.strptime(sorted_Years[0][1].get("date"), '%Y-%m-%d') 
+    latest_year = sorted_Years[0].get("commonStockSharesOutstanding")
+    date_last_year= datetime.strptime(sorted_Years[0].get("date"), '%Y-%m-%d') 
 
-    second_latest_year = sorted_Years[1][1].get("commonStockSharesOutstanding")
-    date_second_last_year= datetime.strptime(sorted_Years[1][1].get("date"), '%Y-%m-%d') 
+    second_latest_year = sorted_Years[1].get("commonStockSharesOutstanding")
+    date_second_last_year= datetime.strptime(sorted_Years[1].get("date"), '%Y-%m-%d') 
 
-    price_last_year = find_adjusted_close_on_or_after(date_last_year, price_data)
-    price_second_last_year = find_adjusted_close_on_or_after(date_second_last_year, price_data)
+    price_last_year = find_adjusted_close_on_or_after(date_last_year, series)
+    price_second_last_year = find_adjusted_close_on_or_after(date_second_last_year, series)
     
     mc_last_year = price_last_year * float(latest_year)
     mc_second_last_year = price_second_last_year * float(second_latest_year)
@@ -120,6 +99,8 @@ def momentum(monthly_growths):
 
 # used within wrapper
 def conservative(data, price_data): 
+    # en PriceSeries så att månadsaggregaten delas mellan volatility och NPY
+    price_data = as_price_series(price_data)
     try:
         vol, closing_prices, monthly_growths = volatility(price_data)
     except Exception as e:
@@ -158,21 +139,14 @@ def conservative_formula(df, separate_data_list):
     df_temp['npy_rank']        = df_temp['npy'].rank(ascending=False, method='min')
     df_temp['moment_rank']     = df_temp['moment'].rank(ascending=False, method='min')
 
-    # Steg 2: Beräkna snitt-rank om alla tre finns, annars sätt None
-    scores_dict = {}
-    for _, entry in df_temp.iterrows():
-        company = entry['Ticker']
-        ranks = [entry['volatility_rank'], entry['npy_rank'], entry['moment_rank']]
-        
-        if all(pd.notna(ranks)):
-            avg_rank = round(sum(ranks) / 3, 1)
-        else:
-            avg_rank = None
-
-        scores_dict[company] = avg_rank
+    # Steg 2: Snitt-rank om alla tre finns, annars NaN
+    ranks = df_temp[['volatility_rank', 'npy_rank', 'moment_rank']]
+    avg_rank = ((ranks['volatility_rank'] + ranks['npy_rank'] + ranks['moment_rank']) / 3).round(1)
+    avg_rank = avg_rank.where(ranks.notna().all(axis=1))
 
-    # Steg 3: Lägg till i ursprungliga df
-    scores_series = pd.Series(scores_dict, name='conservative_score')
+    # Steg 3: Lägg till i ursprungliga df, vid dubbletter gäller sista förekomsten
+    scores_series = pd.Series(avg_rank.to_numpy(), index=df_temp['Ticker'], name='conservative_score')
+    scores_series = scores_series[~scores_series.index.duplicated(keep='last')]
     df['Conservative Formula'] = df['Ticker'].map(scores_series)
 
     return df
@@ -184,7 +158,7 @@ def conservative_formula(df, separate_data_list):
 #Green, Hand, Soliman (Accruals and investment patterns)
 
 def quality_score(df):
-    df = df.copy()
+    df = df.copy(deep=False)
     
     try:
         z_norm_grossp = (df['Bruttovinstmarginal'] - df['Bruttovinstmarginal'].mean(skipna=True)) / df['Bruttovinstmarginal'].std(skipna=True)
@@ -224,59 +198,48 @@ def create_cop_at_noa_composite_score(df):
         print(f"Warning: Missing columns {missing_columns}. Skipping composite score calculation.")
         return df
     
-    # Create a copy of the dataframe
-    result_df = df.copy()
-    
-    # Initialize the composite score column
-    result_df['z_NOA_COP_Composite'] = None
+    # grund kopia, bara den nya kolumnen läggs till
+    result_df = df.copy(deep=False)
     
     try:
-        # Process each sector separately
+        # rader med sektor, cop_at och NOA_GR1A, grupperade per sektor
+        valid = (df['Sector'].notna() & df['cop_at'].notna() & df['NOA_GR1A'].notna()).to_numpy()
+        cop = df['cop_at'][valid]
+        noa = df['NOA_GR1A'][valid]
+        sectors = df['Sector'].to_numpy()[valid]
+        
+        # Series.mean/std per sektor, samma summering som en sektor i taget
+        cop_groups = cop.groupby(sectors, sort=False)
+        noa_groups = noa.groupby(sectors, sort=False)
+        count = cop_groups.transform('size').to_numpy()
+        cop_mean = cop_groups.transform(lambda s: s.mean()).to_numpy()
+        cop_std = cop_groups.transform(lambda s: s.std()).to_numpy()
+        noa_mean = noa_groups.transform(lambda s: s.mean()).to_numpy()
+        noa_std = noa_groups.transform(lambda s: s.std()).to_numpy()
+        
+        # en rad per sektor för utskriften
+        summary = pd.DataFrame({'count': count, 'cop_std': cop_std, 'noa_std': noa_std}, index=sectors)
+        summary = summary[~summary.index.duplicated()]
         for sector_name in df['Sector'].dropna().unique():
-            print(f"Processing sector: {sector_name}")
-            
-            # Get rows for this sector with valid cop_at and NOA_GR1A values
-            sector_mask = (
-                (df['Sector'] == sector_name) & 
-                df['cop_at'].notna() & 
-                df['NOA_GR1A'].notna()
-            )
-            
-            sector_count = sector_mask.sum()
+            sector_count = int(summary.at[sector_name, 'count']) if sector_name in summary.index else 0
             if sector_count < 2:
                 print(f"  Skipping {sector_name}: only {sector_count} valid data points")
                 continue
-            
-            # Get the data for this sector
-            sector_data = df[sector_mask]
-            
-            # Calculate sector statistics
-            cop_mean = sector_data['cop_at'].mean()
-            cop_std = sector_data['cop_at'].std()
-            noa_mean = sector_data['NOA_GR1A'].mean()
-            noa_std = sector_data['NOA_GR1A'].std()
-            
-            print(f"  {sector_name}: {sector_count} companies, COP_AT std={cop_std:.4f}, NOA std={noa_std:.4f}")
-            
-            # Skip if no variation (all values the same)
-            if cop_std == 0 or noa_std == 0:
+            sector_cop_std, sector_noa_std = summary.at[sector_name, 'cop_std'], summary.at[sector_name, 'noa_std']
+            print(f"  {sector_name}: {sector_count} companies, COP_AT std={sector_cop_std:.4f}, NOA std={sector_noa_std:.4f}")
+            if sector_cop_std == 0 or sector_noa_std == 0:
                 print(f"  Skipping {sector_name}: zero standard deviation")
-                continue
-            
-            # Calculate z-scores and composite score for each company in this sector
-            for idx in sector_data.index:
-                cop_value = df.loc[idx, 'cop_at']
-                noa_value = df.loc[idx, 'NOA_GR1A']
-                
-                # Calculate z-scores
-                z_cop = (cop_value - cop_mean) / cop_std
-                z_noa = (noa_value - noa_mean) / noa_std
-                
-                # Calculate composite score: z(COP_AT) - z(NOA_GR1A)
-                composite = z_cop - z_noa
-                
-                # Round and store
-                result_df.loc[idx, 'z_NOA_COP_Composite'] = round(float(composite), 4)
+        
+        # sektorer med minst två bolag och spridning i båda måtten
+        usable = (count >= 2) & (cop_std != 0) & (noa_std != 0)
+        
+        # Composite score: z(COP_AT) - z(NOA_GR1A)
+        composite = ((cop.to_numpy() - cop_mean) / cop_std - (noa.to_numpy() - noa_mean) / noa_std)[usable]
+        
+        # Pythons round, samma avrundning som tidigare (np.round kan skilja i sista decimalen)
+        scores = np.full(len(df), np.nan)
+        scores[np.flatnonzero(valid)[usable]] = [round(float(x), 4) for x in composite]
+        result_df['z_NOA_COP_Composite'] = scores
         
         print("Composite score calculation completed.")
         
@@ -289,36 +252,16 @@ def create_cop_at_noa_composite_score(df):
 ###################### Residual momentum ######################
 
 def calculate_monthly_excess_returns(ticker, price_data, risk_free_rate=1.02):
+    series = as_price_series(price_data)
     # Need at least 40 months: 2 months lag + 37 months for 36 returns  
-    if not price_data or len(price_data) < 40: 
+    if len(series) < 40: 
          return {
             ticker: None
         }
     
     try:
-        # Convert string dates to datetime objects if needed
-        for d in price_data:
-            if isinstance(d['date'], str):
-                d['date'] = datetime.strptime(d['date'], '%Y-%m-%d')
-        
-        # Sort by date to ensure chronological order
-        price_data.sort(key=lambda x: x['date'])
-        
-        # Group by month and get last day of each month
-        monthly_data = defaultdict(list)
-        for entry in price_data:
-            key = (entry['date'].year, entry['date'].month)
-            monthly_data[key].append(entry)
-        
         # Get the last trading day of each month (highest date in each month)
-        monthly_prices = []
-        for key in sorted(monthly_data.keys()):
-            month_entries = monthly_data[key]
-            last_day_entry = max(month_entries, key=lambda x: x['date'])
-            monthly_prices.append({
-                'date': last_day_entry['date'],
-                'adjusted_close': last_day_entry['adjusted_close']
-            })
+        monthly_prices = series.month_end_closes()
         
         # Match Fama-French data period: Skip last 2 months, then take 37 months for 36 returns
         # This ensures price data aligns with Fama-French data (e.g., both end in July when run in September)
@@ -341,19 +284,9 @@ def calculate_monthly_excess_returns(ticker, price_data, risk_free_rate=1.02):
         # Calculate monthly risk-free rate (convert annual to monthly)
         monthly_rf_rate = (risk_free_rate ** (1/12)) - 1
         
-        # Calculate monthly returns and excess returns using relevant_months
-        monthly_excess_returns = []
-        for i in range(1, len(relevant_months)):
-            current_price = relevant_months[i]['adjusted_close']
-            previous_price = relevant_months[i-1]['adjusted_close']
-            
-            # Monthly return
-            monthly_return = (current_price / previous_price) - 1
-            
-            # Excess return (monthly return - risk-free rate)
-            excess_return = monthly_return - monthly_rf_rate
-            
-            monthly_excess_returns.append(excess_return)
+        # Monthly return and excess return (monthly return - risk-free rate)
+        monthly_returns = (relevant_months[1:] / relevant_months[:-1]) - 1
+        monthly_excess_returns = (monthly_returns - monthly_rf_rate).tolist()
         
         return {
             # monthly_excess_returns är nu synkroniserad med Fama-French data
@@ -370,15 +303,21 @@ def calculate_monthly_excess_returns(ticker, price_data, risk_free_rate=1.02):
         }
 
 
-def get_fama_factors(factor_country): 
+def get_fama_factors(factor_country, factor_store=None): 
     """
     Safely fetch Fama-French factors with error handling
     
+    Parameters:
+    factor_store (FactorStore, optional): local/offline factor store; without it
+        the factors are downloaded from the Ken French library on every call
+    
     Returns:
     pandas.DataFrame or None: Fama-French factors for last 36 months, or None if failed
     """
     try:
-        if factor_country == "Europe":
+        if factor_store is not None:
+            ff = factor_store.load(factor_country)
+        elif factor_country == "Europe":
             ff = web.DataReader("Europe_3_Factors", "famafrench")[0]
         else: 
             ff = web.DataReader("F-F_Research_Data_Factors", "famafrench")[0]
@@ -424,13 +363,87 @@ def ticker_excess_returns(df, separate_data_list):
     return ticker_excess_returns
 
 
-def residual_momentum(factor_country, df, separate_data_list):
+def batched_rmom_scores(fama_factors, ticker_returns):
+    """
+    Residual momentum för alla tickers på en gång.
+
+    Designmatrisen (konstant + Mkt-RF, SMB, HML) är densamma för alla tickers,
+    så OLS-koefficienterna fås med en pseudoinvers av 36x4-matrisen mot en
+    36xN-matris med överavkastningar. Residualerna standardiseras kolumnvis
+    (populations-std, som StandardScaler) och rMOM är medelvärdet för t-6 till t-2.
+
+    Returns:
+        dict: {ticker: rMOM}
+    """
+    if len(fama_factors) != 36:
+        print(f"Warning: Fama-French data has {len(fama_factors)} months, need exactly 36")
+        return {}
+
+    factors = fama_factors.to_numpy(dtype=float)
+    if not np.isfinite(factors).all():
+        print(f"Warning: Fama-French data has NaN or infinite values")
+        return {}
+
+    tickers = []
+    columns = []
+    for ticker, returns_list in ticker_returns.items():
+        if returns_list is None or len(returns_list) < 36:
+            continue # Hoppa över om det inte finns tillräckligt med data
+
+        # SÄKERHETSKONTROLL: Kontrollera att vi har exakt 36 månaders data
+        if len(returns_list) != 36:
+            print(f"Warning: {ticker} has {len(returns_list)} months of data, need exactly 36")
+            continue
+
+        try:
+            returns = np.asarray(returns_list, dtype=float)
+        except (TypeError, ValueError) as e:
+            print(f"Error in residual momentum calculation for {ticker}: {e}")
+            continue
+
+        # SÄKERHETSKONTROLL: Kontrollera för NaN eller inf värden
+        if not np.isfinite(returns).all():
+            print(f"Warning: {ticker} has NaN or infinite values in returns data")
+            continue
+
+        tickers.append(ticker)
+        columns.append(returns)
+
+    if not tickers:
+        return {}
+
+    # Regressionen måste ha en konstant term
+    X = np.column_stack([np.ones(len(factors)), factors])
+    Y = np.column_stack(columns)
+
+    # OLS för alla tickers: beta = pinv(X) @ Y, en gemensam pseudoinvers
+    residuals = Y - X @ (np.linalg.pinv(X) @ Y)
+
+    # Standardisera residualerna kolumnvis, konstanta kolumner skalas inte
+    std = residuals.std(axis=0)
+    std[std == 0] = 1.0
+    standardized_residuals = (residuals - residuals.mean(axis=0)) / std
+
+    # Steg 5: Använd residualer från t-6 till t-2 för att undvika reversering
+    rmom = standardized_residuals[-6:-1].mean(axis=0)
+
+    all_rmom_scores = {}
+    for ticker, rmom_score in zip(tickers, rmom):
+        # SÄKERHETSKONTROLL: Kontrollera att resultatet är giltigt
+        if not np.isfinite(rmom_score):
+            print(f"Warning: {ticker} produced invalid rMOM score")
+            continue
+        all_rmom_scores[ticker] = round(float(rmom_score), 4)
+
+    return all_rmom_scores
+
+def residual_momentum(factor_country, df, separate_data_list, factor_store=None):
     """
     Beräknar residual momentum (rMOM) för varje aktie.
 
     1. Hämtar Fama-French 3-faktor-data.
     2. Hämtar månatliga överavkastningar för varje ticker.
-    3. Utför en linjär regression för varje ticker över en 36-månadersperiod för att få residualer.
+    3. Utför en linjär regression för alla tickers samtidigt över en 36-månadersperiod för att få residualer.
     4. Standardiserar residualerna.
     5. Beräknar rMOM-poängen baserat på standardiserade residualer från månader t-6 till t-2.
 
@@ -439,13 +452,14 @@ def residual_momentum(factor_country, df, separate_data_list):
                            vara en del av en större pipeline.
         separate_data_list (list): En lista med dictionaries, där varje dictionary
                                    innehåller ticker och dess överavkastningar.
+        factor_store (FactorStore, optional): Lokal lagring av Fama-French-faktorer.
 
     Returns:
         pd.DataFrame: Ett DataFrame som innehåller varje tickers rMOM-poäng.
     """
     
     # Steg 1: Hämta Fama-French-faktorer
-    fama_factors = get_fama_factors(factor_country)
+    fama_factors = get_fama_factors(factor_country, factor_store)
     
     # SÄKERHETSKONTROLL: Om Fama-French data inte kan hämtas, returnera ursprunglig df
     if fama_factors is None:
@@ -466,77 +480,7 @@ def residual_momentum(factor_country, df, separate_data_list):
         print("Warning: No ticker excess returns found for residual momentum analysis")
         return df
     # Steg 3 & 4: Regression och standardisering av residualer
-    all_rmom_scores = {}
-    
-    for ticker, returns_list in ticker_returns.items():
-        if returns_list is None or len(returns_list) < 36:
-            continue # Hoppa över om det inte finns tillräckligt med data
-        
-        try:
-            # SÄKERHETSKONTROLL: Kontrollera att vi har exakt 36 månaders data
-            if len(returns_list) != 36:
-                print(f"Warning: {ticker} has {len(returns_list)} months of data, need exactly 36")
-                continue
-                
-            # Säkerställ att vi har 36 månaders data och matcha index
-            if len(fama_factors) != 36:
-                print(f"Warning: Fama-French data has {len(fama_factors)} months, need exactly 36")
-                continue
-                
-            returns_series = pd.Series(returns_list, index=fama_factors.index)
-            
-            # SÄKERHETSKONTROLL: Kontrollera för NaN eller inf värden
-            if returns_series.isna().any() or np.isinf(returns_series).any():
-                print(f"Warning: {ticker} has NaN or infinite values in returns data")
-                continue
-            
-            if fama_factors.isna().any().any() or np.isinf(fama_factors).any().any():
-                print(f"Warning: Fama-French data has NaN or infinite values")
-                continue
-            
-            # Regressionen måste ha en konstant term
-            X = sm.add_constant(fama_factors)
-            y = returns_series
-
-            # Utför OLS-regression
-            model = sm.OLS(y, X).fit()
-            residuals = model.resid
-            
-            # SÄKERHETSKONTROLL: Kontrollera residualer
-            if residuals.isna().any() or np.isinf(residuals).any():
-                print(f"Warning: {ticker} regression produced NaN or infinite residuals")
-                continue
-            
-            if len(residuals) < 6:
-                print(f"Warning: {ticker} has too few residuals ({len(residuals)}) for momentum calculation")
-                continue
-            
-            # Standardisera residualerna
-            scaler = StandardScaler()
-            residuals_reshaped = residuals.values.reshape(-1, 1)
-            standardized_residuals = scaler.fit_transform(residuals_reshaped)
-            
-            # Steg 5: Beräkna rMOM-poäng
-            # Använd residualer från t-6 till t-2 för att undvika reversering 
-            rmom_window = standardized_residuals[-6:-1].flatten()
-            
-            # SÄKERHETSKONTROLL: Kontrollera att vi har tillräckligt med data för momentum
-            if len(rmom_window) < 5:
-                print(f"Warning: {ticker} has insufficient data for momentum window")
-                continue
-                
-            rmom_score = np.mean(rmom_window)
-            
-            # SÄKERHETSKONTROLL: Kontrollera att resultatet är giltigt
-            if np.isnan(rmom_score) or np.isinf(rmom_score):
-                print(f"Warning: {ticker} produced invalid rMOM score")
-                continue
-            
-            all_rmom_scores[ticker] = round(rmom_score, 4)
-            
-        except Exception as e:
-            print(f"Error in residual momentum calculation for {ticker}: {e}")
-            continue
+    all_rmom_scores = batched_rmom_scores(fama_factors, ticker_returns)
 
     # SÄKERHETSKONTROLL: Om inga rMOM scores beräknades, returnera ursprunglig df
     if not all_rmom_scores:
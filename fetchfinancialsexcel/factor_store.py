@@ -0,0 +1,139 @@
+import io
+import os
+import json
+import zipfile
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+import pandas_datareader.data as web
+
+# Ken French-datamängder per marknad
+FACTOR_DATASETS = {
+    "US": "F-F_Research_Data_Factors",
+    "Europe": "Europe_3_Factors",
+}
+
+DEFAULT_REFRESH_DAYS = 30
+
+
+def factor_dataset(factor_country: str) -> str:
+    return FACTOR_DATASETS["Europe"] if factor_country == "Europe" else FACTOR_DATASETS["US"]
+
+
+def parse_french_csv(text: str) -> pd.DataFrame:
+    """
+    Parse the monthly table of a Ken French library CSV (as downloaded from
+    the website, possibly extracted from its ZIP). The file starts with a few
+    lines of description, then a header row ``,Mkt-RF,SMB,HML,RF`` followed by
+    ``YYYYMM`` rows, and ends with an annual table that is ignored.
+    """
+    lines = text.splitlines()
+    header_idx = next(
+        (i for i, line in enumerate(lines) if line.replace(" ", "").startswith(",Mkt-RF")),
+        None,
+    )
+    if header_idx is None:
+        raise ValueError("No Mkt-RF header found in Fama-French file")
+
+    columns = [c.strip() for c in lines[header_idx].split(",")[1:]]
+    index, rows = [], []
+    for line in lines[header_idx + 1:]:
+        parts = [p.strip() for p in line.split(",")]
+        # månadstabellen slutar vid första raden som inte börjar med YYYYMM
+        if len(parts[0]) != 6 or not parts[0].isdigit():
+            break
+        index.append(pd.Period(f"{parts[0][:4]}-{parts[0][4:]}", freq="M"))
+        rows.append([float(v) for v in parts[1:len(columns) + 1]])
+
+    return pd.DataFrame(rows, index=pd.PeriodIndex(index, freq="M", name="Date"), columns=columns)
+
+
+def read_factor_file(path: str) -> pd.DataFrame:
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            name = next(n for n in zf.namelist() if n.lower().endswith(".csv"))
+            text = zf.read(name).decode("utf-8", errors="replace")
+        return parse_french_csv(text)
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+
+    # antingen en originalfil från Ken French eller en fil sparad av FactorStore
+    if text.lstrip().startswith("Date,"):
+        df = pd.read_csv(io.StringIO(text), index_col=0)
+        df.index = pd.PeriodIndex(df.index, freq="M", name="Date")
+        return df
+    return parse_french_csv(text)
+
+
+class FactorStore:
+    """
+    Local store for Fama-French factors.
+
+    The monthly factors are downloaded once and kept in ``store_dir``; they
+    are refreshed when a new calendar month has started or the file is older
+    than ``refresh_days``. If the refresh fails the stored copy is used.
+    With ``offline_path`` (a CSV/ZIP file or a directory of them) the factors
+    are only read from disk and no request is ever made.
+    """
+
+    def __init__(self, store_dir: Optional[str] = None, refresh_days: int = DEFAULT_REFRESH_DAYS,
+                 offline_path: Optional[str] = None):
+        self.store_dir = store_dir
+        self.refresh_days = refresh_days
+        self.offline_path = offline_path
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    def _paths(self, dataset: str):
+        return (os.path.join(self.store_dir, f"{dataset}.csv"),
+                os.path.join(self.store_dir, f"{dataset}.meta.json"))
+
+    def _offline_file(self, dataset: str) -> str:
+        if not os.path.isdir(self.offline_path):
+            return self.offline_path
+        for name in sorted(os.listdir(self.offline_path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in (".csv", ".zip") and stem.lower().startswith(dataset.lower()):
+                return os.path.join(self.offline_path, name)
+        raise FileNotFoundError(f"No file for {dataset} in {self.offline_path}")
+
+    def _is_fresh(self, meta_path: str) -> bool:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                fetched_at = datetime.fromisoformat(json.load(f)["fetched_at"])
+        except (OSError, ValueError, KeyError):
+            return False
+        now = datetime.now()
+        same_month = (fetched_at.year, fetched_at.month) == (now.year, now.month)
+        return same_month and (now - fetched_at).days < self.refresh_days
+
+    def load(self, factor_country: str) -> pd.DataFrame:
+        dataset = factor_dataset(factor_country)
+
+        if self.offline_path:
+            return read_factor_file(self._offline_file(dataset))
+
+        if not self.store_dir:
+            return web.DataReader(dataset, "famafrench")[0]
+
+        csv_path, meta_path = self._paths(dataset)
+        if os.path.exists(csv_path) and self._is_fresh(meta_path):
+            return read_factor_file(csv_path)
+
+        try:
+            ff = web.DataReader(dataset, "famafrench")[0]
+        except Exception as e:
+            if os.path.exists(csv_path):
+                print(f"Warning: Could not refresh Fama-French factors ({e}), using stored copy")
+                return read_factor_file(csv_path)
+            raise
+
+        ff_out = ff.copy()
+        ff_out.index = ff_out.index.astype(str)
+        ff_out.index.name = "Date"
+        ff_out.to_csv(csv_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": datetime.now().isoformat()}, f)
+        return ff
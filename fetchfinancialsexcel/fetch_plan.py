@@ -0,0 +1,43 @@
+from typing import Any, List, Optional, Sequence
+
+
+class FetchPlan:
+    """
+    Input rows grouped by resolved ticker. The same security often appears
+    on several rows (several portfolios, share classes resolving to the same
+    code), but each unique ticker is fetched and computed once and
+    ``fan_out`` copies its result back to every row, in input order.
+    Tickers are compared case-insensitively; rows without a ticker get
+    ``None``.
+    """
+
+    def __init__(self, ticker_list: Sequence[str]):
+        # unika tickers i den ordning de först förekommer
+        self.tickers: List[str] = []
+        # per rad: position i self.tickers, None för rader utan ticker
+        self.rows: List[Optional[int]] = []
+        positions = {}
+        for ticker in ticker_list:
+            if not ticker:
+                self.rows.append(None)
+                continue
+            key = ticker.upper()
+            if key not in positions:
+                positions[key] = len(self.tickers)
+                self.tickers.append(ticker)
+            self.rows.append(positions[key])
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @property
+    def duplicates(self) -> int:
+        """Rows that reuse another row's ticker."""
+        return sum(1 for position in self.rows if position is not None) - len(self.tickers)
+
+    def fan_out(self, results: Sequence[Any]) -> List[Any]:
+        """One result per unique ticker (same order as ``tickers``) -> one per input row."""
+        return [results[position] if position is not None else None for position in self.rows]
+
+    def summary(self) -> str:
+        return f"{len(self.tickers)} unique tickers for {len(self.rows)} rows ({self.duplicates} duplicates)"
@@ -0,0 +1,132 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+# de delar av fundamentasvaret som indikatorerna läser, None = hela värdet
+FUNDAMENTALS_SECTIONS: Dict[str, Any] = {
+    "General": None,
+    "Highlights": None,
+    "Valuation": None,
+    "SharesStats": None,
+    "Technicals": None,
+    "Earnings": {"Trend": None, "Annual": None},
+    "Financials": {
+        "Balance_Sheet": {"yearly": None},
+        "Income_Statement": {"yearly": None},
+        "Cash_Flow": {"yearly": None},
+    },
+}
+
+# hur fundamenta hämtas: hela svaret, avkodat selektivt, eller filtrerat redan hos EODHD
+FUNDAMENTALS_MODES = ("full", "slim", "filter")
+
+
+def _filter_paths(spec: Dict[str, Any], prefix: str = ""):
+    for key, sub in spec.items():
+        path = f"{prefix}{key}"
+        if sub is None:
+            yield path
+        else:
+            yield from _filter_paths(sub, f"{path}::")
+
+
+# EODHD:s filter-parameter, nästlade fält skrivs Financials::Balance_Sheet::yearly
+FUNDAMENTALS_FILTER = ",".join(_filter_paths(FUNDAMENTALS_SECTIONS))
+
+
+def slim_fundamentals(data: Any, spec: Dict[str, Any] = FUNDAMENTALS_SECTIONS) -> Any:
+    """Copy of an already decoded response with only the ``spec`` sections."""
+    if not isinstance(data, dict):
+        return data
+    slim = {}
+    for key, sub in spec.items():
+        if key not in data:
+            continue
+        value = data[key]
+        slim[key] = value if sub is None or not isinstance(value, dict) else slim_fundamentals(value, sub)
+    return slim
+
+
+def unflatten_filtered(data: Any) -> Any:
+    """
+    Turn a response to a multi-field ``filter=`` request, keyed by the
+    filter paths (``{"Financials::Balance_Sheet::yearly": {...}}``), back
+    into the nested layout of the full response.
+    """
+    if not isinstance(data, dict):
+        return data
+    nested: Dict[str, Any] = {}
+    for path, value in data.items():
+        keys = path.split("::")
+        node = nested
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return nested
+
+
+_WHITESPACE = " \t\n\r"
+
+
+def _skip_ws(text: str, idx: int) -> int:
+    while idx < len(text) and text[idx] in _WHITESPACE:
+        idx += 1
+    return idx
+
+
+def _decode_object(decoder: json.JSONDecoder, text: str, idx: int, spec: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    # text[idx] är '{'; värden som inte finns i spec avkodas ett i taget och släpps direkt
+    result: Dict[str, Any] = {}
+    idx = _skip_ws(text, idx + 1)
+    if text[idx] == "}":
+        return result, idx + 1
+    while True:
+        key, idx = decoder.raw_decode(text, idx)
+        idx = _skip_ws(text, idx)
+        if text[idx] != ":":
+            raise ValueError(f"Expected ':' at position {idx}")
+        idx = _skip_ws(text, idx + 1)
+
+        sub = spec.get(key, False) if isinstance(key, str) else False
+        if isinstance(sub, dict) and text[idx] == "{":
+            result[key], idx = _decode_object(decoder, text, idx, sub)
+        else:
+            value, idx = decoder.raw_decode(text, idx)
+            if sub is not False:
+                result[key] = value
+            del value
+
+        idx = _skip_ws(text, idx)
+        if text[idx] == ",":
+            idx = _skip_ws(text, idx + 1)
+        elif text[idx] == "}":
+            return result, idx + 1
+        else:
+            raise ValueError(f"Expected ',' or '}}' at position {idx}")
+
+
+def decode_fundamentals(content: Any, spec: Dict[str, Any] = FUNDAMENTALS_SECTIONS) -> Any:
+    """
+    Decode a fundamentals response keeping only the ``spec`` sections.
+
+    Unused sections (quarterly statements, holders, insider transactions,
+    ESG scores, outstanding shares ...) are decoded and dropped one at a
+    time instead of all being held at once, so the peak memory per ticker is
+    close to what is kept. Responses that are not a JSON object are decoded
+    as usual.
+    """
+    text = content.decode("utf-8") if isinstance(content, (bytes, bytearray)) else content
+    decoder = json.JSONDecoder()
+    idx = _skip_ws(text, 0)
+    if idx >= len(text) or text[idx] != "{":
+        return json.loads(text)
+    result, _ = _decode_object(decoder, text, idx, spec)
+    return result
+
+
+def fundamentals_request(mode: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+    """``(params, decode)`` for ``client.get_json`` in the given mode."""
+    if mode == "slim":
+        return None, decode_fundamentals
+    if mode == "filter":
+        return {"filter": FUNDAMENTALS_FILTER}, None
+    return None, None
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+class Statement:
+    """
+    One ``Financials/<name>/yearly`` statement, indexed once: ``dates`` newest
+    first, the matching ``rows`` and numeric columns parsed to float arrays
+    on first use. Offset 0 is the latest year, 1 the year before, and so on.
+    """
+
+    __slots__ = ("yearly", "dates", "rows", "_index", "_columns")
+
+    def __init__(self, yearly: Dict[str, Dict[str, Any]]):
+        self.yearly = yearly
+        self.dates: List[str] = sorted(yearly.keys(), reverse=True)
+        self.rows: List[Dict[str, Any]] = [yearly[d] for d in self.dates]
+        self._index = {d: i for i, d in enumerate(self.dates)}
+        self._columns: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def offset(self, date: str) -> int:
+        # KeyError precis som statement[date] om datumet saknas
+        return self._index[date]
+
+    def get(self, offset: int, field: str, default: Any = None) -> Any:
+        return self.rows[offset].get(field, default)
+
+    def column(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """``(values, ok)``: the field as float64 per row, newest first, and where it parsed."""
+        if field not in self._columns:
+            values = np.full(len(self.rows), np.nan)
+            ok = np.zeros(len(self.rows), dtype=bool)
+            for i, row in enumerate(self.rows):
+                try:
+                    values[i] = float(row[field])
+                    ok[i] = True
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self._columns[field] = (values, ok)
+        return self._columns[field]
+
+    def number(self, offset: int, field: str, default: Any = None) -> float:
+        """Same result (and exception) as ``float(row.get(field, default))`` for the row at ``offset``."""
+        values, ok = self.column(field)
+        if ok[offset]:
+            return float(values[offset])
+        return float(self.rows[offset].get(field, default))
+
+
+class FundamentalsView:
+    """
+    Read-only view of one fundamentals response, built once per ticker and
+    shared by all indicators. ``get`` behaves like the raw dict; the yearly
+    statements are sorted and indexed once instead of in every indicator.
+    """
+
+    __slots__ = ("data", "_statements")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data if data is not None else {}
+        self._statements: Dict[str, Statement] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def statement(self, name: str) -> Statement:
+        if name not in self._statements:
+            yearly = self.data.get("Financials", {}).get(name, {}).get("yearly", {})
+            self._statements[name] = Statement(yearly)
+        return self._statements[name]
+
+
+def as_fundamentals_view(data: Any) -> FundamentalsView:
+    if isinstance(data, FundamentalsView):
+        return data
+    return FundamentalsView(data)
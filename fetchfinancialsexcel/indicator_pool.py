@@ -0,0 +1,57 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from .fundamentals_filter import slim_fundamentals
+from .price_series import as_price_series
+
+def indicator_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The parts of a fundamentals response the indicators read. Quarterly
+    statements, holders, insider transactions, earnings history etc. are
+    left out, which is most of the response for a typical company.
+    """
+    return slim_fundamentals(data)
+
+
+def _compute(ticker: str, data: Dict[str, Any], price_data: Any, price: Optional[Dict[str, Any]]):
+    # körs i arbetsprocessen, core importeras där
+    from .core import compute_company_indicators
+    return compute_company_indicators(ticker, data, price_data, price)
+
+
+class IndicatorPool:
+    """
+    Runs ``compute_company_indicators`` in a pool of worker processes so the
+    CPU-bound indicator work is not limited by the GIL of the download
+    threads. Only the sections the indicators read are sent, and prices are
+    sent as a ``PriceSeries`` (two numpy arrays) instead of a list of dicts.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # fork från en process med många trådar kan låsa sig, forkserver/spawn är säkrare
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+            return self._executor
+
+    def compute(self, ticker: str, data: Dict[str, Any], price_data: Any,
+                price: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        future = self._get_executor().submit(
+            _compute, ticker, indicator_payload(data), as_price_series(price_data), price
+        )
+        return future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
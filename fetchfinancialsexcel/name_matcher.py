@@ -0,0 +1,162 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+# bolagsformer och ord som inte skiljer bolag åt, tas bort före jämförelsen
+STOPWORDS = frozenset({
+    "THE", "AND", "OF", "INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY", "LTD", "LIMITED",
+    "LLC", "PLC", "AG", "SA", "SE", "NV", "BV", "AB", "PUBL", "ASA", "AS", "A/S", "OYJ", "SPA", "GMBH",
+    "KGAA", "HOLDING", "HOLDINGS", "GROUP", "SER", "SERIES", "CLASS", "SHS", "SHARES", "ORD", "ADR",
+})
+
+# antal kandidater från det inverterade indexet som får ett n-gram-betyg
+MAX_CANDIDATES = 50
+# tvetydigt om näst bästa ticker ligger närmare än så här
+AMBIGUITY_MARGIN = 0.1
+# okända ord matchas mot ordförrådet med n-gram om likheten är minst så här
+TOKEN_SIMILARITY = 0.5
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+
+def name_tokens(name: str) -> List[str]:
+    """Upper-case ASCII words of ``name`` without legal forms; all words if nothing else is left."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").upper()
+    tokens = [t for t in _NON_ALNUM.split(text.replace("&", " AND ")) if t]
+    kept = [t for t in tokens if t not in STOPWORDS]
+    return kept or tokens
+
+
+def ngrams(text: str, n: int = 3) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class NameMatcher:
+    """
+    Offline company name -> ticker matcher over a set of known names (the
+    exchange symbol lists in the ticker index).
+
+    Names are reduced to upper-case words without legal forms ("Volvo AB
+    ser. B" -> ``VOLVO B``). Candidates come from an inverted word index
+    weighted by inverse document frequency, and misspelled words are mapped
+    to the closest known word by character trigrams. The best candidates are
+    then scored by word overlap and trigram similarity of the whole name.
+    ``match`` returns the best ticker with a confidence in [0, 1], lowered
+    when another ticker scores almost as well.
+    """
+
+    def __init__(self, names: Dict[str, str]):
+        self._tickers: List[str] = []
+        self._tokens: List[Set[str]] = []
+        self._weights: List[float] = []
+        self._grams: List[Set[str]] = []
+        self._exact: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+
+        for name, ticker in names.items():
+            tokens = name_tokens(name)
+            key = " ".join(tokens)
+            if not key or key in self._exact:
+                continue
+            idx = len(self._tickers)
+            self._exact[key] = idx
+            self._tickers.append(ticker)
+            self._tokens.append(set(tokens))
+            self._grams.append(ngrams(key))
+            for token in set(tokens):
+                postings.setdefault(token, []).append(idx)
+
+        self._postings = postings
+        n = max(len(self._tickers), 1)
+        self._idf = {token: math.log(1.0 + n / len(ids)) for token, ids in postings.items()}
+        self._weights = [sum(self._idf[t] for t in tokens) for tokens in self._tokens]
+        # ordförrådets trigram, för att hitta felstavade ord
+        self._vocab_grams: Dict[str, List[str]] = {}
+        self._vocab_sizes: Dict[str, int] = {}
+        for token in postings:
+            grams = ngrams(token)
+            self._vocab_sizes[token] = len(grams)
+            for gram in grams:
+                self._vocab_grams.setdefault(gram, []).append(token)
+        # okända ord upprepas ofta (felstavningar, ändelser), slås upp en gång
+        self._token_cache: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def _known_token(self, token: str) -> Tuple[Optional[str], float]:
+        # (ord i ordförrådet, likhet): exakt träff eller närmaste enligt trigram
+        if token in self._postings:
+            return token, 1.0
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            return cached
+        grams = ngrams(token)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._vocab_grams.get(gram, ()))
+        best, best_score = None, 0.0
+        for other, count in shared.items():
+            score = 2.0 * count / (len(grams) + self._vocab_sizes[other])
+            if score > best_score:
+                best, best_score = other, score
+        result = (best, best_score) if best_score >= TOKEN_SIMILARITY else (None, 0.0)
+        self._token_cache[token] = result
+        return result
+
+    def match(self, name: str) -> Tuple[Optional[str], float]:
+        """``(ticker, confidence)`` of the best match, ``(None, 0.0)`` if no name shares a word."""
+        tokens = name_tokens(name)
+        key = " ".join(tokens)
+        if not key:
+            return None, 0.0
+        if key in self._exact:
+            return self._tickers[self._exact[key]], 1.0
+
+        # ord i frågan -> (ord i ordförrådet, vikt)
+        mapped: Dict[str, float] = {}
+        query_weight = 0.0
+        for token in set(tokens):
+            known, similarity = self._known_token(token)
+            weight = self._idf.get(known, 0.0) if known else math.log(1.0 + max(len(self._tickers), 1))
+            query_weight += weight
+            if known:
+                mapped[known] = max(mapped.get(known, 0.0), weight * similarity)
+
+        overlap: Dict[int, float] = {}
+        for known, weight in mapped.items():
+            for idx in self._postings[known]:
+                overlap[idx] = overlap.get(idx, 0.0) + weight
+        if not overlap:
+            return None, 0.0
+
+        candidates = heapq.nlargest(MAX_CANDIDATES, overlap, key=overlap.get)
+        grams = ngrams(key)
+        scored = []
+        for idx in candidates:
+            # viktad Jaccard: gemensamma ord mot alla ord i fråga och kandidat
+            union = query_weight + self._weights[idx] - overlap[idx]
+            token_score = overlap[idx] / union if union > 0 else 0.0
+            scored.append((0.5 * token_score + 0.5 * _dice(grams, self._grams[idx]), idx))
+        scored.sort(reverse=True)
+
+        best_score, best_idx = scored[0]
+        best_ticker = self._tickers[best_idx]
+        runner_up = next((score for score, idx in scored[1:] if self._tickers[idx] != best_ticker), 0.0)
+        confidence = best_score - max(0.0, AMBIGUITY_MARGIN - (best_score - runner_up))
+        return best_ticker, round(max(confidence, 0.0), 4)
+
+    def match_many(self, names: Iterable[str]) -> List[Tuple[Optional[str], float]]:
+        return [self.match(name) for name in names]
@@ -0,0 +1,206 @@
+import queue
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .company_data_extraction_EODH import REAL_TIME_CHUNK_SIZE
+
+DEFAULT_QUEUE_SIZE = 64
+
+# markerar att ett steg inte får fler poster
+_DONE = object()
+# markerar en rad vars ticker redan finns på en tidigare rad, resultatet kopieras vid slutet
+_DUPLICATE = object()
+
+
+def _start_stage(name: str, workers: int, in_q: queue.Queue, out_q: queue.Queue,
+                 handle: Callable[[Any], Any]) -> List[Thread]:
+    """
+    Start ``workers`` threads that move items from ``in_q`` to ``out_q``
+    through ``handle``. When all of them have seen ``_DONE`` a single
+    ``_DONE`` is passed on, so the next stage can have any number of workers.
+    """
+    remaining = [workers]
+    lock = Lock()
+
+    def worker():
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                # skicka vidare till syskontrådarna i samma steg
+                in_q.put(_DONE)
+                break
+            out_q.put(handle(item))
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            out_q.put(_DONE)
+
+    threads = [Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class StreamingPipeline:
+    """
+    Threaded pipeline search -> quotes -> fetch -> indicators -> accumulate
+    with bounded queues between the stages, so indicators for one ticker are
+    computed while others are still being resolved and downloaded. Results
+    come back in input order; only the caller's cross-sectional analysis has
+    to wait for the whole universe.
+
+    Items are ``(index, company, ticker, isin)``. The stage callables are:
+    ``resolve(company, ticker, isin) -> ticker`` (``None`` skips search),
+    ``fetch_quotes(tickers) -> quotes`` for one batch of real-time symbols,
+    ``fetch(ticker, quotes) -> (data, price_data, price)``,
+    ``compute(ticker, data, price_data, price) -> (combined, other)`` and
+    ``completed(ticker) -> result or None`` for tickers already done.
+
+    Rows whose resolved ticker already appeared on an earlier row are not
+    fetched again; they get the first row's result when the run finishes.
+    ``duplicates`` is the number of such rows in the last run.
+    """
+
+    def __init__(self, fetch: Callable, compute: Callable, fetch_quotes: Callable,
+                 resolve: Optional[Callable] = None, completed: Optional[Callable] = None,
+                 search_workers: int = 8, fetch_workers: int = 10, compute_workers: int = 2,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, quote_batch_size: int = REAL_TIME_CHUNK_SIZE,
+                 quote_batch_wait: float = 0.05):
+        self.fetch = fetch
+        self.compute = compute
+        self.fetch_quotes = fetch_quotes
+        self.resolve = resolve
+        self.completed = completed
+        self.search_workers = search_workers
+        self.fetch_workers = fetch_workers
+        self.compute_workers = compute_workers
+        self.queue_size = queue_size
+        self.quote_batch_size = quote_batch_size
+        self.quote_batch_wait = quote_batch_wait
+        self.duplicates = 0
+        self._seen = set()
+
+    def _resolve_item(self, item):
+        index, company, ticker, isin = item
+        try:
+            ticker = self.resolve(company, ticker, isin) or ""
+        except Exception as e:
+            print(f"Error resolving {company or ticker}: {e}")
+            ticker = ""
+        return index, company, ticker
+
+    def _batch_quotes(self, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        # samlar upp till quote_batch_size tickers till en realtidsförfrågan,
+        # eller skickar det som finns om inget nytt kommer inom quote_batch_wait
+        batch, done = [], False
+        while not done:
+            try:
+                item = in_q.get(timeout=self.quote_batch_wait if batch else None)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                batch.append(item)
+            if batch and (done or item is None or len(batch) >= self.quote_batch_size):
+                self._flush_quotes(batch, out_q)
+                batch = []
+        out_q.put(_DONE)
+
+    def _flush_quotes(self, batch, out_q: queue.Queue) -> None:
+        pending = [t for _, _, t, done in batch if t and done is None]
+        quotes = {}
+        if pending:
+            try:
+                quotes = self.fetch_quotes(pending)
+            except Exception as e:
+                print(f"Error fetching real-time quotes for {len(pending)} tickers: {e}")
+        for item in batch:
+            out_q.put(item + (quotes,))
+
+    def _mark_completed(self, item):
+        # ett enda arbetssteg, så _seen behöver inget lås
+        index, company, ticker = item
+        if ticker and ticker.upper() in self._seen:
+            return index, company, ticker, _DUPLICATE
+        if ticker:
+            self._seen.add(ticker.upper())
+        done = self.completed(ticker) if ticker and self.completed is not None else None
+        return index, company, ticker, done
+
+    def _fetch_item(self, item):
+        index, company, ticker, done, quotes = item
+        if not ticker or done is not None:
+            return index, company, ticker, done, None
+        try:
+            return index, company, ticker, None, self.fetch(ticker, quotes)
+        except Exception as e:
+            print(f"Error fetching {ticker}: {e}")
+            return index, company, ticker, None, None
+
+    def _compute_item(self, item):
+        index, company, ticker, done, payload = item
+        if done is not None or payload is None:
+            return index, company, ticker, done
+        try:
+            return index, company, ticker, self.compute(ticker, *payload)
+        except Exception as e:
+            print(f"Error computing indicators for {ticker}: {e}")
+            return index, company, ticker, None
+
+    def run(self, company_list: List[str], ticker_list: List[str],
+            isin_list: Optional[List[Optional[str]]] = None) -> Tuple[List[str], List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]]:
+        """Returns the resolved tickers and each row's ``(combined, other)`` (``None`` if missing), in input order."""
+        n = len(ticker_list)
+        size = self.queue_size
+        self._seen = set()
+        input_q, resolved_q, marked_q, quoted_q, fetched_q, result_q = (queue.Queue(size) for _ in range(6))
+
+        threads = []
+        if self.resolve is not None:
+            threads += _start_stage("search", self.search_workers, input_q, resolved_q, self._resolve_item)
+        else:
+            threads += _start_stage("search", 1, input_q, resolved_q, lambda item: item[:3])
+        threads += _start_stage("journal", 1, resolved_q, marked_q, self._mark_completed)
+        quote_thread = Thread(target=self._batch_quotes, args=(marked_q, quoted_q), name="quotes", daemon=True)
+        quote_thread.start()
+        threads.append(quote_thread)
+        threads += _start_stage("fetch", self.fetch_workers, quoted_q, fetched_q, self._fetch_item)
+        threads += _start_stage("indicators", self.compute_workers, fetched_q, result_q, self._compute_item)
+
+        def feed():
+            for index in range(n):
+                company = company_list[index] if index < len(company_list) else ""
+                isin = isin_list[index] if isin_list and index < len(isin_list) else None
+                input_q.put((index, company, ticker_list[index], isin))
+            input_q.put(_DONE)
+
+        feeder = Thread(target=feed, name="feed", daemon=True)
+        feeder.start()
+
+        resolved = [""] * n
+        results: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]] = [None] * n
+        first: Dict[str, int] = {}
+        duplicates = []
+        while True:
+            item = result_q.get()
+            if item is _DONE:
+                break
+            index, _, ticker, result = item
+            resolved[index] = ticker
+            if result is _DUPLICATE:
+                duplicates.append(index)
+                continue
+            results[index] = result
+            if ticker:
+                first[ticker.upper()] = index
+
+        feeder.join()
+        for thread in threads:
+            thread.join()
+
+        for index in duplicates:
+            results[index] = results[first[resolved[index].upper()]]
+        self.duplicates = len(duplicates)
+        return resolved, results
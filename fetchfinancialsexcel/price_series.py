@@ -0,0 +1,96 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+class PriceSeries:
+    """
+    Daily adjusted closes for one ticker as two aligned, date-sorted columns:
+    ``dates`` (datetime64[D]) and ``adjusted_close`` (float64).
+
+    All price based analytics accept either a ``PriceSeries`` or the raw list
+    of ``{'date': ..., 'adjusted_close': ...}`` dicts returned by the EOD
+    endpoint; the latter is converted once with ``as_price_series``.
+    """
+
+    __slots__ = ("dates", "adjusted_close", "_resampled")
+
+    def __init__(self, dates, adjusted_close):
+        self.dates = np.asanyarray(dates, dtype="datetime64[D]")
+        self.adjusted_close = np.asanyarray(adjusted_close, dtype="float64")
+        # månads- och årsaggregat beräknas en gång och delas av alla indikatorer
+        self._resampled: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __reduce__(self):
+        # skickas som två vanliga arrayer, utan memmap och cachade aggregat
+        return PriceSeries, (np.asarray(self.dates), np.asarray(self.adjusted_close))
+
+    @classmethod
+    def empty(cls) -> "PriceSeries":
+        return cls(np.array([], dtype="datetime64[D]"), np.array([], dtype="float64"))
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "PriceSeries":
+        records = [r for r in records if isinstance(r, dict) and r.get("date")]
+        if not records:
+            return cls.empty()
+
+        # datumsträngar tolkas av numpy i ett svep i stället för strptime per rad
+        dates = np.array([r["date"][:10] if isinstance(r["date"], str) else r["date"] for r in records],
+                         dtype="datetime64[D]")
+        closes = np.array([np.nan if r.get("adjusted_close") is None else r["adjusted_close"] for r in records],
+                          dtype="float64")
+
+        order = np.argsort(dates, kind="stable")
+        return cls(dates[order], closes[order])
+
+    def between(self, from_date: str, to_date: str) -> "PriceSeries":
+        lo = np.searchsorted(self.dates, np.datetime64(from_date, "D"), side="left")
+        hi = np.searchsorted(self.dates, np.datetime64(to_date, "D"), side="right")
+        return PriceSeries(self.dates[lo:hi], self.adjusted_close[lo:hi])
+
+    def last_date(self) -> str:
+        return str(self.dates[-1]) if len(self.dates) else ""
+
+    def month_end_closes(self) -> np.ndarray:
+        """Adjusted close on the last trading day of every month, oldest first."""
+        if "month_end" not in self._resampled:
+            self._resampled["month_end"] = self.adjusted_close[month_end_index(self.dates)]
+        return self._resampled["month_end"]
+
+    def annual_average_closes(self) -> Dict[int, Tuple[float, int]]:
+        """``{year: (average adjusted close, data points)}``, missing closes skipped."""
+        if "annual" not in self._resampled:
+            valid = ~np.isnan(self.adjusted_close)
+            years = self.dates[valid].astype("datetime64[Y]").astype(int) + 1970
+            unique_years, inverse = np.unique(years, return_inverse=True)
+            sums = np.bincount(inverse, weights=self.adjusted_close[valid], minlength=len(unique_years))
+            counts = np.bincount(inverse, minlength=len(unique_years))
+            self._resampled["annual"] = {
+                int(year): (float(total / count), int(count))
+                for year, total, count in zip(unique_years, sums, counts)
+            }
+        return self._resampled["annual"]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [{"date": str(d), "adjusted_close": float(c)} for d, c in zip(self.dates, self.adjusted_close)]
+
+
+def as_price_series(price_data: Any) -> PriceSeries:
+    if isinstance(price_data, PriceSeries):
+        return price_data
+    # felsvar från fetch_price_data är en dict, {ticker: {}}
+    if not isinstance(price_data, list) or not price_data:
+        return PriceSeries.empty()
+    return PriceSeries.from_records(price_data)
+
+
+def month_end_index(dates: np.ndarray) -> np.ndarray:
+    # index för sista handelsdagen i varje månad, dates måste vara sorterade
+    if len(dates) == 0:
+        return np.array([], dtype=np.intp)
+    months = dates.astype("datetime64[M]")
+    return np.append(np.flatnonzero(months[1:] != months[:-1]), len(dates) - 1)
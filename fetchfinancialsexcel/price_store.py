@@ -0,0 +1,189 @@
+import os
+import json
+import datetime
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .price_series import PriceSeries, as_price_series
+
+DEFAULT_HISTORY_YEARS = 5
+
+
+def _to_date(value: str) -> datetime.date:
+    return datetime.date.fromisoformat(value[:10])
+
+
+def _weekdays_between(first: str, last: str) -> int:
+    # antal vardagar strikt mellan två datum
+    return int(np.busday_count(_to_date(first) + datetime.timedelta(days=1), _to_date(last)))
+
+
+class PriceStore:
+    """
+    Local incremental store of daily adjusted closes, one ticker per set of
+    columnar ``.npy`` files (dates as datetime64[D], closes as float64) that
+    are memory-mapped on load.
+
+    ``get_history`` only downloads the tail after the last stored bar. The
+    last stored bar is requested again and compared with the new response; if
+    its ``adjusted_close`` changed (split or dividend) the full history is
+    downloaded instead. ``seed_exchange`` appends the latest daily bar for a
+    whole exchange from the bulk last-day endpoint instead of one request per
+    ticker.
+    """
+
+    def __init__(self, store_dir: str, history_years: int = DEFAULT_HISTORY_YEARS):
+        self.store_dir = store_dir
+        self.history_years = history_years
+        self._locks: Dict[str, Lock] = {}
+        self._locks_lock = Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _lock(self, ticker: str) -> Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(ticker.upper(), Lock())
+
+    def _path(self, ticker: str, part: str) -> str:
+        safe = ticker.upper().replace("/", "_")
+        return os.path.join(self.store_dir, f"{safe}.{part}")
+
+    def exists(self, ticker: str) -> bool:
+        return os.path.exists(self._path(ticker, "meta.json"))
+
+    def load(self, ticker: str) -> Tuple[PriceSeries, Optional[str]]:
+        try:
+            with open(self._path(ticker, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            dates = np.load(self._path(ticker, "dates.npy"), mmap_mode="r")
+            closes = np.load(self._path(ticker, "close.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return PriceSeries.empty(), None
+
+        # metadata skrivs sist, olika längd betyder en avbruten skrivning
+        if len(dates) != meta.get("length") or len(closes) != meta.get("length"):
+            return PriceSeries.empty(), None
+        return PriceSeries(dates, closes), meta.get("history_from")
+
+    def save(self, ticker: str, series: PriceSeries, history_from: str) -> None:
+        for part, values in (("dates.npy", series.dates), ("close.npy", series.adjusted_close)):
+            path = self._path(ticker, part)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(tmp_path, path)
+
+        meta_path = self._path(ticker, "meta.json")
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"history_from": history_from, "length": len(series)}, f)
+        os.replace(tmp_path, meta_path)
+
+    def remove(self, ticker: str) -> None:
+        for part in ("meta.json", "dates.npy", "close.npy"):
+            try:
+                os.remove(self._path(ticker, part))
+            except OSError:
+                pass
+
+    def default_from_date(self) -> str:
+        return f"{datetime.date.today().year - self.history_years}-01-01"
+
+    def _download(self, client, ticker: str, from_date: str, to_date: str) -> PriceSeries:
+        # går förbi svarscachen, butiken är själv cachen för kurshistorik
+        params = {"from": from_date, "to": to_date, "period": "d"}
+        data = client.get(f"eod/{ticker}", params).json()
+        return as_price_series(data)
+
+    def get_history(self, ticker: str, client, from_date: Optional[str] = None,
+                    to_date: Optional[str] = None) -> PriceSeries:
+        from_date = from_date or self.default_from_date()
+        to_date = to_date or datetime.date.today().isoformat()
+
+        with self._lock(ticker):
+            series, history_from = self.load(ticker)
+
+            if not len(series) or not history_from or history_from > from_date:
+                series = self._download(client, ticker, from_date, to_date)
+                history_from = from_date
+            elif series.last_date() < to_date:
+                last_date = series.last_date()
+                last_close = series.adjusted_close[-1]
+                tail = self._download(client, ticker, last_date, to_date)
+
+                overlap = np.flatnonzero(tail.dates == np.datetime64(last_date, "D"))
+                if len(overlap) and not self._same_close(tail.adjusted_close[overlap[0]], last_close):
+                    # justerade kurser har ändrats bakåt i tiden, hämta om allt
+                    print(f"Adjusted prices changed for {ticker}, refetching full history.")
+                    series = self._download(client, ticker, history_from, to_date)
+                else:
+                    new = tail.dates > np.datetime64(last_date, "D")
+                    series = PriceSeries(
+                        np.concatenate([series.dates, tail.dates[new]]),
+                        np.concatenate([series.adjusted_close, tail.adjusted_close[new]]),
+                    )
+            else:
+                return series.between(from_date, to_date)
+
+            if len(series):
+                self.save(ticker, series, history_from)
+
+        return series.between(from_date, to_date)
+
+    @staticmethod
+    def _same_close(new: float, old: float) -> bool:
+        return bool(abs(new - old) <= 1e-6 * max(abs(old), 1.0))
+
+    def seed_exchange(self, exchange: str, client, date: Optional[str] = None) -> int:
+        """
+        Append the bulk last-day bars for ``exchange`` to every stored ticker
+        whose history ends on the previous weekday. Tickers with a split or
+        dividend on that date are dropped so their next ``get_history`` does a
+        full download with fresh adjusted prices. Returns the number of tickers
+        extended.
+        """
+        params = {"date": date} if date else {}
+        bulk = client.get(f"eod-bulk-last-day/{exchange}", params).json() or []
+
+        adjusted = set()
+        for event_type in ("splits", "dividends"):
+            try:
+                events = client.get(f"eod-bulk-last-day/{exchange}", {**params, "type": event_type}).json() or []
+            except Exception as e:
+                print(f"Error fetching bulk {event_type} for {exchange}: {e}")
+                # utan händelsedata går det inte att veta vilka kurser som justerats
+                return 0
+            adjusted.update(f"{event.get('code')}.{exchange}".upper() for event in events)
+
+        extended = 0
+        for bar in bulk:
+            code = bar.get("code")
+            bar_date = bar.get("date")
+            if not code or not bar_date or bar.get("adjusted_close") is None:
+                continue
+
+            ticker = f"{code}.{exchange}"
+            if not self.exists(ticker):
+                continue
+
+            with self._lock(ticker):
+                if ticker.upper() in adjusted:
+                    self.remove(ticker)
+                    continue
+
+                series, history_from = self.load(ticker)
+                if not len(series) or series.last_date() >= bar_date:
+                    continue
+                # lägg bara till om inga handelsdagar saknas emellan
+                if _weekdays_between(series.last_date(), bar_date) > 0:
+                    continue
+
+                series = PriceSeries(
+                    np.append(series.dates, np.datetime64(bar_date, "D")),
+                    np.append(series.adjusted_close, float(bar["adjusted_close"])),
+                )
+                self.save(ticker, series, history_from)
+                extended += 1
+
+        return extended
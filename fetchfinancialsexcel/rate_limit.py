@@ -0,0 +1,183 @@
+import time
+import asyncio
+from threading import Condition, Lock
+from typing import Any, Dict, Optional
+
+# EODHD:s gräns gäller API-anrop per minut, inte HTTP-förfrågningar
+DEFAULT_CALLS_PER_MINUTE = 1000
+
+# kostnad i API-anrop per förfrågan, enligt EODHD:s prislista
+ENDPOINT_COSTS = {
+    "fundamentals": 10,
+    "eod-bulk-last-day": 100,
+}
+
+THROTTLE_STATUSES = (429,)
+
+
+def endpoint_cost(path: str, params: Optional[Dict[str, Any]] = None) -> int:
+    endpoint = path.split("/", 1)[0]
+    cost = ENDPOINT_COSTS.get(endpoint, 1)
+    # realtid med s= kostar ett anrop per symbol
+    if endpoint == "real-time" and params and params.get("s"):
+        cost += len([s for s in str(params["s"]).split(",") if s])
+    return cost
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    ``reserve`` takes the tokens immediately (the balance may go negative)
+    and returns how long the caller has to wait, so concurrent callers are
+    served in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self, cost: float) -> float:
+        cost = min(cost, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= cost
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def drain(self) -> None:
+        # efter 429 väntar alla tills hinken fyllts på igen
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = time.monotonic()
+
+
+class AIMDConcurrency:
+    """
+    Additive-increase/multiplicative-decrease limit on requests in flight.
+
+    A throttled or failed request (429/5xx) multiplies the limit by
+    ``decrease`` (at most once per ``cooldown`` seconds, so one burst of
+    errors counts once). Every ``limit`` healthy responses faster than
+    ``target_latency`` raise it by one, up to ``maximum``.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: Optional[int] = None,
+                 decrease: float = 0.5, target_latency: float = 2.0, cooldown: float = 1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(initial or maximum)
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = Condition()
+
+    def ensure_maximum(self, maximum: int) -> None:
+        with self._cond:
+            if maximum > self.maximum:
+                # en gräns som inte har backat än följer med upp
+                if self.limit >= self.maximum:
+                    self.limit = float(maximum)
+                self.maximum = maximum
+                self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, status: Optional[int], latency: float) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if status is not None and (status in THROTTLE_STATUSES or status >= 500):
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif status is not None and status < 400 and latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Shared limiter for every EODHD request, sync and async.
+
+    Combines a token bucket weighted by ``endpoint_cost`` (EODHD counts a
+    fundamentals request as 10 calls) with an ``AIMDConcurrency`` limit, and
+    counts what was actually achieved so runs can be sized from ``stats()``.
+    """
+
+    def __init__(self, calls_per_minute: float = DEFAULT_CALLS_PER_MINUTE, max_concurrency: int = 10,
+                 target_latency: float = 2.0, async_poll_interval: float = 0.005):
+        self.calls_per_minute = calls_per_minute
+        self.bucket = TokenBucket(calls_per_minute / 60.0, calls_per_minute)
+        self.concurrency = AIMDConcurrency(max_concurrency, target_latency=target_latency)
+        self.async_poll_interval = async_poll_interval
+        self._stats_lock = Lock()
+        self._started: Optional[float] = None
+        self._requests = 0
+        self._calls = 0
+        self._throttled = 0
+
+    def _count(self, cost: int) -> None:
+        with self._stats_lock:
+            if self._started is None:
+                self._started = time.monotonic()
+            self._requests += 1
+            self._calls += cost
+
+    def before(self, path: str, params: Optional[Dict[str, Any]] = None) -> None:
+        cost = endpoint_cost(path, params)
+        wait = self.bucket.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        self.concurrency.acquire()
+        self._count(cost)
+
+    async def before_async(self, path: str, params: Optional[Dict[str, Any]] = None) -> None:
+        cost = endpoint_cost(path, params)
+        wait = self.bucket.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # gränsen delas med trådar, så event-loopen pollar i stället för att blockera
+        while not self.concurrency.try_acquire():
+            await asyncio.sleep(self.async_poll_interval)
+        self._count(cost)
+
+    def after(self, status: Optional[int], latency: float) -> None:
+        # okänd status (t.ex. nätverksfel) påverkar inte gränsen
+        if not isinstance(status, int):
+            status = None
+        if status in THROTTLE_STATUSES:
+            with self._stats_lock:
+                self._throttled += 1
+            self.bucket.drain()
+        self.concurrency.release(status, latency)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            requests, calls, throttled = self._requests, self._calls, self._throttled
+        return {
+            "requests": requests,
+            "api_calls": calls,
+            "throttled": throttled,
+            "elapsed": elapsed,
+            "requests_per_second": requests / elapsed if elapsed > 0 else 0.0,
+            "calls_per_second": calls / elapsed if elapsed > 0 else 0.0,
+            "concurrency_limit": int(self.concurrency.limit),
+        }
@@ -0,0 +1,156 @@
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import python_calamine
+except ImportError:  # valfritt beroende, openpyxl i read-only-läge används annars
+    python_calamine = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # valfritt beroende, bara för Parquet
+    pyarrow = None
+
+# bolagsnamn, ticker och ISIN, övriga kolumner läses inte
+INPUT_COLUMNS = 3
+
+INPUT_FORMATS = ("xlsx", "xls", "csv", "parquet")
+
+INPUT_EXTENSIONS = {
+    ".xlsx": "xlsx",
+    ".xlsm": "xlsx",
+    ".xls": "xls",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+# text som pandas läser som saknat värde, samma för alla läsare som för den tidigare pd.read_excel
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+# sheets="all" läser alla flikar i arbetsboken
+ALL_SHEETS = "all"
+
+Sheets = Union[None, str, Sequence[str]]
+
+
+def input_format(path: str) -> Optional[str]:
+    """Input format for the extension of ``path``, ``None`` if it is not supported."""
+    return INPUT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def _with_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    # alltid exakt tre kolumner 0, 1, 2, saknade fylls med None
+    frame = frame.iloc[:, :INPUT_COLUMNS]
+    frame.columns = range(frame.shape[1])
+    return frame.reindex(columns=range(INPUT_COLUMNS))
+
+
+def _selected_sheets(available: List[str], sheets: Sheets) -> List[str]:
+    if sheets is None:
+        return available[:1]
+    if sheets == ALL_SHEETS:
+        return available
+    if isinstance(sheets, str):
+        sheets = [sheets]
+    missing = [name for name in sheets if name not in available]
+    if missing:
+        raise ValueError(f"Sheet(s) not found: {', '.join(missing)} (available: {', '.join(available)})")
+    return list(sheets)
+
+
+def _read_openpyxl(path: str, sheets: Sheets) -> List[pd.DataFrame]:
+    # read-only: raderna strömmas från XML:en, bara de tre första kolumnerna görs om till värden
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        frames = []
+        for name in _selected_sheets(workbook.sheetnames, sheets):
+            rows = workbook[name].iter_rows(max_col=INPUT_COLUMNS, values_only=True)
+            frame = pd.DataFrame.from_records(list(rows), columns=range(INPUT_COLUMNS), coerce_float=False)
+            frames.append(frame.mask(frame.isin(NA_VALUES)))
+        return frames
+    finally:
+        workbook.close()
+
+
+def _read_pandas_excel(path: str, sheets: Sheets) -> List[pd.DataFrame]:
+    # calamine om det finns, annars pandas standardmotor (xlrd för .xls)
+    engine = "calamine" if python_calamine is not None else None
+    with pd.ExcelFile(path, engine=engine) as book:
+        names = _selected_sheets([str(name) for name in book.sheet_names], sheets)
+        return [_with_columns(book.parse(name, header=None, keep_default_na=False, na_values=list(NA_VALUES)))
+                for name in names]
+
+
+def read_input_frames(path: str, sheets: Sheets = None) -> List[pd.DataFrame]:
+    """
+    The first three columns (company, ticker, ISIN) of every selected sheet
+    as frames with columns 0, 1, 2. Excel sheets and CSV files start with a
+    header row, which is dropped; Parquet files have their header in the
+    schema. ``sheets`` is ignored for CSV and Parquet.
+    """
+    fmt = input_format(path)
+    if fmt == "csv":
+        frame = pd.read_csv(path, header=None, dtype=object, keep_default_na=False, na_values=list(NA_VALUES))
+        return [_with_columns(frame).iloc[1:]]
+    if fmt == "parquet":
+        if pyarrow is None:
+            raise ImportError("Reading Parquet requires pyarrow. Install it with: pip install FetchFinancialsExcel[parquet]")
+        columns = pyarrow.parquet.read_schema(path).names[:INPUT_COLUMNS]
+        return [_with_columns(pd.read_parquet(path, columns=columns))]
+
+    if fmt == "xlsx" and python_calamine is None:
+        frames = _read_openpyxl(path, sheets)
+    else:
+        frames = _read_pandas_excel(path, sheets)
+    return [frame.iloc[1:] for frame in frames]
+
+
+def _clean_ticker(ticker: str) -> str:
+    ticker = ''.join(c for c in ticker if c.isalpha() or c.isdigit() or c == '.' or c == '-')
+    return ticker.strip('.-')
+
+
+def _upper_text(column: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    # str(cell).strip().upper() för alla ifyllda celler, "" för tomma
+    present = column.notna().to_numpy()
+    text = column.astype(object).where(present, "").astype(str).str.strip().str.upper()
+    return text, present
+
+
+def normalize_tickers(frame: pd.DataFrame) -> Tuple[List[str], List[str], List[Optional[str]]]:
+    """
+    ``(company_list, tickers, isin_list)`` from a frame with columns 0, 1, 2.
+    Names and ISINs are stripped and upper-cased, tickers keep only letters,
+    digits, '.' and '-' without leading or trailing '.'/'-', missing ISINs
+    are ``None`` and rows where all three are empty are skipped.
+    """
+    company, _ = _upper_text(frame[0])
+    ticker, _ = _upper_text(frame[1])
+    isin, isin_present = _upper_text(frame[2])
+
+    # ASCII med reguljärt uttryck, övriga (t.ex. Å, Ö) med samma teckentest som str.isalpha/isdigit
+    ascii_mask = ticker.str.isascii().to_numpy()
+    cleaned = ticker.str.replace(r"[^0-9A-Z.\-]", "", regex=True).str.strip(".-")
+    if not ascii_mask.all():
+        cleaned[~ascii_mask] = ticker[~ascii_mask].map(_clean_ticker)
+
+    keep = (company != "").to_numpy() | (cleaned != "").to_numpy() | (isin_present & (isin != "").to_numpy())
+    isin_values = isin.astype(object).where(isin_present, None)
+    return company[keep].tolist(), cleaned[keep].tolist(), isin_values[keep].tolist()
+
+
+def read_tickers(path: str, sheets: Sheets = None) -> Tuple[List[str], List[str], List[Optional[str]]]:
+    """``(company_list, tickers, isin_list)`` from an Excel, CSV or Parquet file, sheets in order."""
+    frames = read_input_frames(path, sheets)
+    frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return normalize_tickers(frame)
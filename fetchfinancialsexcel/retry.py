@@ -0,0 +1,184 @@
+import csv
+import time
+import random
+import asyncio
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # valfritt beroende, bara för den asynkrona motorn
+    aiohttp = None
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 10.0
+DEFAULT_JITTER = 0.5
+DEFAULT_DEADLINE = 60.0
+
+# 408/425/429 och serverfel är tillfälliga, övriga 4xx (401, 403, 404 ...) är permanenta
+TRANSIENT_STATUSES = (408, 425, 429)
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status
+    return None
+
+
+def is_transient(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUSES or status >= 500
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, asyncio.TimeoutError)):
+        return True
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientConnectionError):
+        return True
+    return False
+
+
+def failure_reason(exc: BaseException) -> str:
+    status = error_status(exc)
+    if status is not None:
+        return f"HTTP {status}"
+    if isinstance(exc, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.ConnectionError) or (
+            aiohttp is not None and isinstance(exc, aiohttp.ClientConnectionError)):
+        return "connection error"
+    return type(exc).__name__
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = None
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        headers = exc.response.headers
+    elif aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+        headers = exc.headers
+    try:
+        return float(headers.get("Retry-After")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retries transient failures (timeouts, connection errors, 429 and 5xx)
+    with exponential backoff and jitter. Permanent failures such as 401, 403
+    and 404 are raised at once. No retry is started after ``deadline``
+    seconds from the first attempt. The exception that is finally raised
+    carries the number of tries in ``retry_attempts``.
+    """
+
+    def __init__(self, attempts: int = DEFAULT_ATTEMPTS, backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF, jitter: float = DEFAULT_JITTER,
+                 deadline: float = DEFAULT_DEADLINE):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        delay *= 1 - self.jitter * random.random()
+        retry_after = _retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def _next_delay(self, attempt: int, exc: BaseException, started: float) -> Optional[float]:
+        # None betyder att felet ska kastas vidare
+        if attempt >= self.attempts or not is_transient(exc):
+            return None
+        delay = self.delay(attempt, exc)
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+    def call(self, func, *args, **kwargs) -> Any:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    e.retry_attempts = attempt
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, func, *args, **kwargs) -> Any:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    e.retry_attempts = attempt
+                    raise
+                await asyncio.sleep(delay)
+
+
+class ErrorReport:
+    """
+    Per-ticker record of the requests that failed after all retries, written
+    to CSV at the end of a run so failed rows can be told apart from
+    companies that simply lack data.
+    """
+
+    FIELDS = ("ticker", "stage", "reason", "status", "transient", "attempts", "message")
+
+    def __init__(self):
+        self._lock = Lock()
+        self.failures: List[Dict[str, Any]] = []
+        # tickers (versaler) med minst ett tillfälligt fel, has_transient anropas för varje ticker
+        self._transient: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.failures)
+
+    def record(self, ticker: str, stage: str, exc: BaseException) -> None:
+        entry = {
+            "ticker": ticker,
+            "stage": stage,
+            "reason": failure_reason(exc),
+            "status": error_status(exc),
+            "transient": is_transient(exc),
+            "attempts": getattr(exc, "retry_attempts", 1),
+            "message": str(exc),
+        }
+        with self._lock:
+            self.failures.append(entry)
+            if entry["transient"] and ticker:
+                self._transient.add(ticker.upper())
+
+    def for_ticker(self, ticker: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [f for f in self.failures if f["ticker"] and f["ticker"].upper() == ticker.upper()]
+
+    def has_transient(self, ticker: str) -> bool:
+        with self._lock:
+            return bool(ticker) and ticker.upper() in self._transient
+
+    def clear(self) -> None:
+        with self._lock:
+            self.failures = []
+            self._transient = set()
+
+    def write(self, path: str) -> None:
+        with self._lock:
+            failures = list(self.failures)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(failures)
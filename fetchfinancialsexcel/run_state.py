@@ -0,0 +1,154 @@
+import os
+import json
+import datetime
+from threading import Lock, get_ident
+from typing import Any, Dict, Optional, Tuple
+
+from .checkpoint import _json_default
+from .fundamentals_filter import slim_fundamentals
+from .price_series import as_price_series
+
+DEFAULT_MAX_AGE_DAYS = 7
+
+# vad som behöver göras för en ticker vid en delta-körning
+REUSE = "reuse"    # inget har ändrats, sparade indikatorer används
+PRICES = "prices"  # fundamenta oförändrade, bara kurserna hämtas och indikatorerna räknas om
+FULL = "full"      # allt hämtas
+
+
+def fundamentals_updated_at(data: Any) -> Optional[str]:
+    general = data.get("General") if isinstance(data, dict) else None
+    if not isinstance(general, dict):
+        return None
+    updated_at = general.get("UpdatedAt")
+    return str(updated_at) if updated_at else None
+
+
+def last_bar_date(price_data: Any) -> Optional[str]:
+    try:
+        series = as_price_series(price_data)
+    except Exception:
+        return None
+    if len(series) == 0:
+        return None
+    return str(series.dates[-1])
+
+
+def quote_bar_date(quote: Optional[Dict[str, Any]]) -> Optional[str]:
+    # realtidssvarets timestamp (unix, UTC) -> datumet för senaste handelsdagen
+    try:
+        timestamp = int(quote["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).date().isoformat()
+
+
+class RunState:
+    """
+    Per-ticker inputs and results of earlier runs, one JSON file per ticker,
+    for delta refreshes. Each entry holds the fingerprint of the raw inputs
+    (fundamentals ``General.UpdatedAt`` and the date of the last price bar),
+    the slim fundamentals and the ``(combined, other)`` indicators.
+
+    ``plan`` compares a fresh fingerprint with the stored one and decides per
+    ticker: ``reuse`` the stored indicators, refetch only ``prices`` (and
+    recompute from the stored fundamentals), or a ``full`` refetch. Entries
+    older than ``max_age_days`` are always refetched in full.
+    """
+
+    def __init__(self, state_dir: str, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.state_dir = state_dir
+        self.max_age_days = max_age_days
+        self._lock = Lock()
+        self._entries: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._plan: Dict[str, str] = {}
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, ticker: str) -> str:
+        safe = ticker.upper().replace("/", "_")
+        return os.path.join(self.state_dir, f"{safe}.json")
+
+    def get(self, ticker: str) -> Optional[Dict[str, Any]]:
+        key = ticker.upper()
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        try:
+            with open(self._path(ticker), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def is_stale(self, entry: Dict[str, Any], now: Optional[datetime.datetime] = None) -> bool:
+        now = now or datetime.datetime.now()
+        try:
+            saved = datetime.datetime.fromisoformat(entry["saved"])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return (now - saved).total_seconds() > self.max_age_days * 86400
+
+    def plan(self, ticker: str, updated_at: Optional[str], last_bar: Optional[str]) -> str:
+        """Decide and remember what has to be refetched for ``ticker``."""
+        entry = self.get(ticker)
+        if entry is None or self.is_stale(entry) or not updated_at or updated_at != entry.get("updated_at"):
+            decision = FULL
+        elif last_bar and last_bar == entry.get("last_bar"):
+            decision = REUSE
+        else:
+            decision = PRICES
+        with self._lock:
+            self._plan[ticker.upper()] = decision
+        return decision
+
+    def decision(self, ticker: str) -> Optional[str]:
+        with self._lock:
+            return self._plan.get(ticker.upper())
+
+    def result(self, ticker: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Stored indicators if ``ticker`` was planned as ``reuse``."""
+        if self.decision(ticker) != REUSE:
+            return None
+        entry = self.get(ticker)
+        return (entry["combined"], entry["other"]) if entry is not None else None
+
+    def fundamentals(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Stored fundamentals if they were planned as unchanged."""
+        if self.decision(ticker) not in (REUSE, PRICES):
+            return None
+        entry = self.get(ticker)
+        return entry.get("fundamentals") if entry is not None else None
+
+    def save(self, ticker: str, data: Dict[str, Any], price_data: Any,
+             combined: Dict[str, Any], other: Dict[str, Any]) -> None:
+        previous = self.get(ticker)
+        # fundamenta som återanvändes behåller sin ursprungliga tidsstämpel, så max_age räknas från hämtningen
+        saved = datetime.datetime.now().isoformat(timespec="seconds")
+        if self.decision(ticker) == PRICES and previous is not None:
+            saved = previous.get("saved", saved)
+        entry = {
+            "ticker": ticker.upper(),
+            "saved": saved,
+            "updated_at": fundamentals_updated_at(data),
+            "last_bar": last_bar_date(price_data),
+            "fundamentals": slim_fundamentals(data),
+            "combined": combined,
+            "other": other,
+        }
+        text = json.dumps(entry, default=_json_default)
+
+        path = self._path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        with self._lock:
+            # läses om från disk vid behov, så att posten motsvarar det som sparades
+            self._entries.pop(ticker.upper(), None)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            decisions = list(self._plan.values())
+        return {decision: decisions.count(decision) for decision in (REUSE, PRICES, FULL)}
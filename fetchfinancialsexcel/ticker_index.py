@@ -0,0 +1,196 @@
+import os
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_TTL_DAYS = 30
+DEFAULT_NEGATIVE_TTL_DAYS = 1
+
+# journalen skrivs om när den har fler än så här många överspelade rader per levande post
+_COMPACT_RATIO = 2
+
+
+def normalize_keyword(keyword: Any) -> str:
+    # samma nyckel oavsett skiftläge och extra mellanslag
+    return " ".join(str(keyword).upper().split())
+
+
+def symbol_keys(symbol: Dict[str, Any], exchange: str) -> Tuple[Optional[str], List[str]]:
+    """``(ticker, keys)`` for one row of the exchange symbol list: the ticker itself, its bare code, ISIN and name."""
+    code = symbol.get("Code")
+    if not code:
+        return None, []
+    ticker = f"{code}.{exchange}".upper()
+    keys = [normalize_keyword(key) for key in (ticker, code, symbol.get("Isin"), symbol.get("Name")) if key]
+    return ticker, keys
+
+
+class TickerIndex:
+    """
+    Persistent ISIN / ticker / company name -> ``CODE.EXCHANGE`` index for
+    ``resolve_ticker``, kept as an append-only JSON lines file where the last
+    line for a keyword wins.
+
+    Search results are added as they arrive, including keywords the search
+    found nothing for, so the next run resolves a known universe without any
+    requests. Found tickers expire after ``ttl_days`` and negative results
+    after ``negative_ttl_days``, so new listings are picked up. ``seed`` fills
+    the index from EODHD's exchange symbol lists, one request per exchange.
+    Keywords that are company names are flagged, ``names`` feeds the offline
+    ``NameMatcher``.
+    """
+
+    def __init__(self, path: str, ttl_days: float = DEFAULT_TTL_DAYS,
+                 negative_ttl_days: float = DEFAULT_NEGATIVE_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        # nyckel -> (ticker eller None, sparad som unix-tid)
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}
+        # nycklar som är bolagsnamn
+        self._names: Set[str] = set()
+        self._file = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = (entry["ticker"], float(entry["saved"]))
+                    if entry.get("name"):
+                        self._names.add(entry["key"])
+                except (ValueError, KeyError, TypeError):
+                    # sista raden kan vara halvskriven om körningen kraschade
+                    continue
+        if lines > _COMPACT_RATIO * len(self._entries):
+            self.compact()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, ticker: Optional[str], saved: float, now: float) -> bool:
+        return now - saved > (self.ttl if ticker else self.negative_ttl)
+
+    def lookup(self, keyword: str) -> Tuple[bool, Optional[str]]:
+        """``(known, ticker)``; ``(True, None)`` is a cached "no match", ``(False, None)`` means search."""
+        key = normalize_keyword(keyword)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0], entry[1], time.time()):
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, entry[0]
+
+    def names(self) -> Dict[str, str]:
+        """Company name -> ticker for every live entry that is a name with a match."""
+        now = time.time()
+        with self._lock:
+            return {
+                key: self._entries[key][0] for key in self._names
+                if key in self._entries and self._entries[key][0]
+                and not self._expired(self._entries[key][0], self._entries[key][1], now)
+            }
+
+    def _line(self, key: str, ticker: Optional[str], saved: float) -> str:
+        entry = {"key": key, "ticker": ticker, "saved": saved}
+        if key in self._names:
+            entry["name"] = True
+        return json.dumps(entry) + "\n"
+
+    def record(self, keyword: str, ticker: Optional[str], name: bool = False) -> None:
+        key = normalize_keyword(keyword)
+        ticker = ticker.upper() if ticker else None
+        saved = time.time()
+        with self._lock:
+            self._entries[key] = (ticker, saved)
+            if name:
+                self._names.add(key)
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(self._line(key, ticker, saved))
+            self._file.flush()
+
+    def compact(self) -> None:
+        """Rewrite the journal with one line per live entry, dropping expired ones."""
+        now = time.time()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._entries = {
+                key: (ticker, saved) for key, (ticker, saved) in self._entries.items()
+                if not self._expired(ticker, saved, now)
+            }
+            self._names &= self._entries.keys()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, (ticker, saved) in self._entries.items():
+                    f.write(self._line(key, ticker, saved))
+            os.replace(tmp_path, self.path)
+
+    def add_symbols(self, exchange: str, symbols: Iterable[Dict[str, Any]],
+                    taken: Optional[set] = None) -> int:
+        """
+        Add one exchange symbol list. Within a list the first row for a
+        keyword wins, and keywords in ``taken`` (already seeded from an
+        earlier exchange) are left alone. Returns the number of keywords added.
+        """
+        taken = taken if taken is not None else set()
+        saved = time.time()
+        added = 0
+        with self._lock:
+            for symbol in symbols:
+                ticker, keys = symbol_keys(symbol, exchange)
+                name = normalize_keyword(symbol["Name"]) if symbol.get("Name") else None
+                for key in keys:
+                    if key in taken:
+                        continue
+                    taken.add(key)
+                    self._entries[key] = (ticker, saved)
+                    if key == name:
+                        self._names.add(key)
+                    added += 1
+        return added
+
+    def seed(self, exchanges: Iterable[str], client) -> int:
+        """
+        Seed the index from ``exchange-symbol-list`` for each exchange. Where
+        the same ISIN, code or name is listed on several exchanges, the
+        exchange listed first wins. Returns the number of keywords seeded.
+        """
+        taken: set = set()
+        seeded = 0
+        for exchange in exchanges:
+            exchange = exchange.strip().upper()
+            if not exchange:
+                continue
+            try:
+                symbols = client.get(f"exchange-symbol-list/{exchange}").json() or []
+            except Exception as e:
+                print(f"Error fetching symbol list for {exchange}: {e}")
+                continue
+            count = self.add_symbols(exchange, symbols, taken)
+            print(f"Seeded {count} ticker index entries from {len(symbols)} symbols on {exchange}")
+            seeded += count
+        if seeded:
+            self.compact()
+        return seeded
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,374 @@
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # valfritt beroende, openpyxl i write-only-läge används annars
+    xlsxwriter = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # valfritt beroende, bara för Parquet och Arrow
+    pyarrow = None
+
+# rader som görs om till Python-värden åt gången, håller minnet platt för stora tabeller
+DEFAULT_CHUNK_SIZE = 2000
+
+# Excel tillåter högst så här många tecken i en cell
+MAX_CELL_LENGTH = 32767
+
+# talformat per kolumntyp, kan ersättas per kolumn med number_formats
+NUMBER_FORMATS = {
+    "int": "0",
+    "float": "#,##0.00##",
+    "datetime": "yyyy-mm-dd",
+}
+
+WRITER_ENGINES = ("xlsxwriter", "openpyxl")
+
+OUTPUT_FORMATS = ("xlsx", "parquet", "arrow", "csv")
+
+# filändelse -> format, okända ändelser skrivs som xlsx precis som tidigare
+FORMAT_EXTENSIONS = {
+    ".xlsx": "xlsx",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".csv": "csv",
+}
+
+# kontrolltecken som inte får förekomma i XML (samma som openpyxl:s ILLEGAL_CHARACTERS_RE)
+_ILLEGAL_CHARACTERS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+_COLUMN_NAME_CHARACTERS = str.maketrans({c: "_" for c in "/\\*[]:?"})
+
+
+def clean_column_name(name: Any) -> str:
+    return str(name).strip().translate(_COLUMN_NAME_CHARACTERS)
+
+
+def _column_kind(series: pd.Series) -> str:
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "object"
+
+
+def _clean_text(value: str) -> str:
+    value = _ILLEGAL_CHARACTERS.sub("", value)
+    return value[:MAX_CELL_LENGTH]
+
+
+def _clean_object(value: Any, text=_clean_text) -> Any:
+    # blandade kolumner: tal behålls som tal, allt som inte är en skalär blir text
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return text(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = value.item() if isinstance(value, np.generic) else value
+        return value if not isinstance(value, float) or math.isfinite(value) else None
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return text(str(value))
+
+
+def _cell_values(series: pd.Series, kind: str) -> np.ndarray:
+    """The column as an object array ready for a cell writer: inf/NaN/NA -> None."""
+    if kind == "float":
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        cells = values.astype(object)
+        cells[~np.isfinite(values)] = None
+        return cells
+    if kind == "datetime":
+        if getattr(series.dt, "tz", None) is not None:
+            series = series.dt.tz_localize(None)
+        cells = np.array(series.dt.to_pydatetime(), dtype=object)
+        cells[series.isna().to_numpy()] = None
+        return cells
+    if kind in ("int", "bool") and not series.hasnans:
+        return series.to_numpy().astype(object)
+    cells = series.to_numpy(dtype=object)
+    missing = pd.isna(cells)
+    cells = np.array([None if m else _clean_object(v) for v, m in zip(cells, missing)], dtype=object)
+    return cells
+
+
+def prepare_frame(df: pd.DataFrame) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Column names, kinds and problems (inf values, over-long strings) of
+    ``df``, found in one vectorized pass per column type.
+    """
+    names = [clean_column_name(c) for c in df.columns]
+    kinds = [_column_kind(df.iloc[:, i]) for i in range(df.shape[1])]
+    problems = []
+
+    float_positions = [i for i, k in enumerate(kinds) if k == "float"]
+    if float_positions:
+        values = df.iloc[:, float_positions].to_numpy(dtype=float, na_value=np.nan)
+        inf_counts = np.isinf(values).sum(axis=0)
+        for position, count in zip(float_positions, inf_counts):
+            if count:
+                problems.append(f"{names[position]} (inf values: {int(count)})")
+
+    for position, kind in enumerate(kinds):
+        if kind != "object":
+            continue
+        lengths = df.iloc[:, position].str.len() if pd.api.types.is_string_dtype(df.iloc[:, position]) else None
+        if lengths is not None and lengths.max() > 1000:
+            problems.append(f"{names[position]} (long strings: max {int(lengths.max())})")
+
+    return names, kinds, problems
+
+
+def _iter_rows(df: pd.DataFrame, kinds: List[str], chunk_size: int):
+    # en bit i taget görs om till Python-värden, sedan släpps den
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [_cell_values(chunk.iloc[:, i], kind) for i, kind in enumerate(kinds)]
+        yield from zip(*columns)
+
+
+def _column_formats(names: List[str], kinds: List[str], number_formats: Optional[Dict[str, str]]) -> List[Optional[str]]:
+    overrides = number_formats or {}
+    return [overrides.get(name, NUMBER_FORMATS.get(kind)) for name, kind in zip(names, kinds)]
+
+
+def _write_xlsxwriter(df, path, names, kinds, formats, sheet_name, chunk_size) -> None:
+    # constant_memory skriver varje rad till disk när nästa påbörjas
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header = workbook.add_format({"bold": True})
+        cache = {}
+        for col, fmt in enumerate(formats):
+            if fmt:
+                if fmt not in cache:
+                    cache[fmt] = workbook.add_format({"num_format": fmt})
+                # celler utan eget format får kolumnens format
+                worksheet.set_column(col, col, None, cache[fmt])
+        worksheet.write_row(0, 0, names, header)
+        for row, values in enumerate(_iter_rows(df, kinds, chunk_size), start=1):
+            worksheet.write_row(row, 0, values)
+    finally:
+        workbook.close()
+
+
+def _write_openpyxl(df, path, names, kinds, formats, sheet_name, chunk_size) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    # write-only: rader strömmas till filen i stället för att hållas som cellobjekt
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    bold = Font(bold=True)
+
+    header = []
+    for name in names:
+        cell = WriteOnlyCell(worksheet, value=name)
+        cell.font = bold
+        header.append(cell)
+    worksheet.append(header)
+
+    # en formaterad cell per kolumn återanvänds, varje rad skrivs ut innan nästa läggs till
+    templates = {}
+    for i, fmt in enumerate(formats):
+        if fmt:
+            templates[i] = WriteOnlyCell(worksheet)
+            templates[i].number_format = fmt
+    for values in _iter_rows(df, kinds, chunk_size):
+        if templates:
+            values = list(values)
+            for i, cell in templates.items():
+                if values[i] is not None:
+                    cell.value = values[i]
+                    values[i] = cell
+        worksheet.append(values)
+    workbook.save(path)
+
+
+_WRITERS = {
+    "xlsxwriter": _write_xlsxwriter,
+    "openpyxl": _write_openpyxl,
+}
+
+
+def write_excel(df: pd.DataFrame, path: str, engine: Optional[str] = None,
+                number_formats: Optional[Dict[str, str]] = None, sheet_name: str = "Sheet1",
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Stream ``df`` to an .xlsx file without building the whole sheet in
+    memory: xlsxwriter in ``constant_memory`` mode if it is installed,
+    otherwise openpyxl in write-only mode. inf/NaN/None become empty cells,
+    numbers stay numbers, text is stripped of characters XML does not allow,
+    and numeric columns get a number format per type (``NUMBER_FORMATS``,
+    overridable per column). If no engine can write the file, a CSV is
+    written next to it instead. Returns the path that was written.
+    """
+    names, kinds, problems = prepare_frame(df)
+    if problems:
+        print(f"Found potentially problematic columns: {problems}")
+    formats = _column_formats(names, kinds, number_formats)
+
+    if engine is not None:
+        if engine not in WRITER_ENGINES:
+            raise ValueError(f"Unknown writer engine '{engine}', expected one of {WRITER_ENGINES}")
+        engines = [engine]
+    else:
+        engines = [e for e in WRITER_ENGINES if e != "xlsxwriter" or xlsxwriter is not None]
+
+    for name in engines:
+        if name == "xlsxwriter" and xlsxwriter is None:
+            print("xlsxwriter is not installed")
+            continue
+        try:
+            _WRITERS[name](df, path, names, kinds, formats, sheet_name, chunk_size)
+            return path
+        except Exception as e:
+            print(f"Error with {name} engine: {e}")
+
+    # Fallback to CSV if Excel fails
+    csv_file = path.replace(".xlsx", ".csv")
+    print(f"Saving as CSV instead: {csv_file}")
+    clean_frame(df, report=False).to_csv(csv_file, index=False)
+    return csv_file
+
+
+def _typed_object_column(series: pd.Series) -> pd.Series:
+    # en typ per kolumn: bara tal -> float64, annars text; helt tomma kolumner blir float64
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    cleaned = [None if m else _clean_object(v, text=str) for v, m in zip(values, missing)]
+    present = [v for v in cleaned if v is not None]
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return pd.Series([np.nan if v is None else float(v) for v in cleaned], index=series.index, dtype="float64")
+    return pd.Series([None if v is None else str(v) for v in cleaned], index=series.index, dtype=object)
+
+
+def clean_frame(df: pd.DataFrame, report: bool = True) -> pd.DataFrame:
+    """
+    The cleaning shared by the columnar outputs: the same column names as
+    the Excel sheet, inf -> NaN, and one type per column. Float, int, bool
+    and datetime columns keep their dtype. Object columns become float64
+    when they only hold numbers (or nothing) and text otherwise, so the
+    schema only depends on the content type, not on which rows were missing.
+    """
+    names, kinds, problems = prepare_frame(df)
+    if problems and report:
+        print(f"Found potentially problematic columns: {problems}")
+
+    columns = {}
+    for position, (name, kind) in enumerate(zip(names, kinds)):
+        series = df.iloc[:, position]
+        if kind == "float":
+            values = series.to_numpy(dtype=float, na_value=np.nan, copy=True)
+            values[np.isinf(values)] = np.nan
+            columns[position] = pd.Series(values, index=df.index, dtype="float64")
+        elif kind == "datetime" and getattr(series.dt, "tz", None) is not None:
+            columns[position] = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        elif kind == "object":
+            columns[position] = _typed_object_column(series)
+        else:
+            columns[position] = series
+    cleaned = pd.concat(columns, axis=1) if columns else pd.DataFrame(index=df.index)
+    cleaned.columns = names
+    return cleaned.reset_index(drop=True)
+
+
+def arrow_schema(df: pd.DataFrame):
+    """Explicit Arrow schema for a ``clean_frame`` result."""
+    fields = []
+    for name in df.columns:
+        dtype = df[name].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            arrow_type = pyarrow.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            arrow_type = pyarrow.int64()
+        elif pd.api.types.is_float_dtype(dtype):
+            arrow_type = pyarrow.float64()
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            arrow_type = pyarrow.timestamp("ns")
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(name, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def _require_pyarrow(fmt: str) -> None:
+    if pyarrow is None:
+        raise ImportError(
+            f"Writing {fmt} requires pyarrow. Install it with: pip install FetchFinancialsExcel[parquet]"
+        )
+
+
+def to_arrow_table(df: pd.DataFrame):
+    _require_pyarrow("Arrow")
+    cleaned = clean_frame(df)
+    return pyarrow.Table.from_pandas(cleaned, schema=arrow_schema(cleaned), preserve_index=False)
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> str:
+    _require_pyarrow("Parquet")
+    pyarrow.parquet.write_table(to_arrow_table(df), path)
+    return path
+
+
+def write_arrow(df: pd.DataFrame, path: str) -> str:
+    # Arrow IPC-fil (samma som Feather v2), kan minnesmappas av läsaren
+    _require_pyarrow("Arrow")
+    table = to_arrow_table(df)
+    with pyarrow.OSFile(path, "wb") as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as ipc_writer:
+            ipc_writer.write_table(table)
+    return path
+
+
+def write_csv(df: pd.DataFrame, path: str) -> str:
+    clean_frame(df).to_csv(path, index=False)
+    return path
+
+
+def output_format(path: str, fmt: Optional[str] = None) -> str:
+    """``fmt`` if given, otherwise the format for the file extension (xlsx if unknown)."""
+    if fmt is not None:
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}', expected one of {OUTPUT_FORMATS}")
+        return fmt
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "xlsx")
+
+
+def check_output_format(path: str, fmt: Optional[str] = None) -> str:
+    """Like ``output_format``, but also raises ``ImportError`` if the format needs pyarrow and it is missing."""
+    fmt = output_format(path, fmt)
+    if fmt in ("parquet", "arrow"):
+        _require_pyarrow(fmt.capitalize())
+    return fmt
+
+
+def write_output(df: pd.DataFrame, path: str, fmt: Optional[str] = None) -> str:
+    """Write ``df`` in the format chosen by ``fmt`` or the extension of ``path``. Returns the path written."""
+    fmt = output_format(path, fmt)
+    if fmt == "parquet":
+        return write_parquet(df, path)
+    if fmt == "arrow":
+        return write_arrow(df, path)
+    if fmt == "csv":
+        return write_csv(df, path)
+    return write_excel(df, path)
@@ -46,6 +46,13 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=read_requirements(),
+    extras_require={
+        "async": ["aiohttp>=3.8.0"],
+        "excel": ["XlsxWriter>=1.2.0"],
+        "parquet": ["pyarrow>=7.0.0"],
+        "calamine": ["python-calamine>=0.2.0"],
+        "test": ["statsmodels>=0.13.0", "scikit-learn>=1.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "fetch-financials-excel=fetchfinancialsexcel.cli:main",